@@ -1 +1,4 @@
 from external_two_way_sort.external_sort import my_sort as sort
+from external_two_way_sort.external_sort import sort_iter
+from external_two_way_sort.async_io import IOStats
+from external_two_way_sort.metrics import PhaseStats, SortStats
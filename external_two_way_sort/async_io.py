@@ -0,0 +1,244 @@
+from queue import Queue, Empty
+from threading import Event, Thread
+from time import perf_counter
+from typing import Iterable, NamedTuple, Optional
+
+IO_BATCH_SIZE = 1024
+
+
+class SpillPass(NamedTuple):
+    """
+    Объем временных лент, записанных за один проход сортировки
+    """
+    file_num: str
+    pass_num: int
+    raw_bytes: int
+    compressed_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        """
+        Степень сжатия лент прохода
+        """
+        return self.raw_bytes / self.compressed_bytes \
+            if self.compressed_bytes else 1.0
+
+    @property
+    def saved(self) -> int:
+        """
+        Кол-во байт, сэкономленных сжатием
+        """
+        return self.raw_bytes - self.compressed_bytes
+
+
+class IOStats:
+    """
+    Счетчики времени, которое сортировка простаивает в ожидании ввода-вывода,
+    и объем сжатых временных лент по проходам
+    """
+    def __init__(self):
+        self.read_wait = 0.0
+        self.write_wait = 0.0
+        self.read_batches = 0
+        self.write_batches = 0
+        self.spill_passes = []
+
+    def add_spill_pass(self, file_num, pass_num: int, raw_bytes: int,
+                       compressed_bytes: int) -> None:
+        """
+        Учет объема лент, записанных за проход
+        :param file_num: номер входного файла
+        :param pass_num: номер прохода, 0 - формирование начальных серий
+        :param raw_bytes: объем данных до сжатия
+        :param compressed_bytes: объем данных после сжатия
+        """
+        self.spill_passes.append(SpillPass(str(file_num), pass_num,
+                                           raw_bytes, compressed_bytes))
+
+    def add(self, other: "IOStats") -> None:
+        """
+        Прибавление счетчиков другого экземпляра, например,
+        полученного из дочернего процесса
+        :param other: прибавляемые счетчики
+        """
+        self.read_wait += other.read_wait
+        self.write_wait += other.write_wait
+        self.read_batches += other.read_batches
+        self.write_batches += other.write_batches
+        self.spill_passes.extend(other.spill_passes)
+
+    def as_dict(self) -> dict:
+        """
+        Счетчики в виде, пригодном для сериализации в json
+        :return: словарь счетчиков
+        """
+        return {"read_wait": self.read_wait, "write_wait": self.write_wait,
+                "read_batches": self.read_batches,
+                "write_batches": self.write_batches,
+                "spill_passes": [dict(item._asdict(), ratio=item.ratio,
+                                      saved=item.saved)
+                                 for item in self.spill_passes]}
+
+    def __repr__(self) -> str:
+        spill = ""
+        if self.spill_passes:
+            raw = sum(item.raw_bytes for item in self.spill_passes)
+            compressed = sum(item.compressed_bytes
+                             for item in self.spill_passes)
+            spill = (f", spill: {raw} -> {compressed} bytes "
+                     f"(ratio: {raw / max(compressed, 1):.2f}, "
+                     f"saved: {raw - compressed} bytes)")
+        return (f"IOStats(read_wait: {self.read_wait:.4f} sec, "
+                f"write_wait: {self.write_wait:.4f} sec, "
+                f"read_batches: {self.read_batches}, "
+                f"write_batches: {self.write_batches}{spill})")
+
+
+class ReadAhead:
+    """
+    Итератор по ленте, заранее считывающий пачки значений
+    в фоновом потоке. Поток читает ленту до конца, поэтому один
+    экземпляр используется для всех серий ленты за проход
+    """
+    def __init__(self, tape, depth: int, stats: Optional[IOStats] = None,
+                 batch_size: int = IO_BATCH_SIZE):
+        """
+        Инициализация и запуск фонового чтения
+        :param tape: лента (IO), открытая на чтение
+        :param depth: максимальное кол-во считанных заранее пачек
+        :param stats: счетчики простоя
+        :param batch_size: кол-во значений в пачке
+        """
+        self.tape = tape
+        self.stats = stats if stats is not None else IOStats()
+        self.batch_size = batch_size
+        self._queue = Queue(maxsize=depth)
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._values = self._generate()
+
+    def _run(self) -> None:
+        """
+        Фоновое чтение ленты пачками, в конце в очередь кладется None,
+        а при ошибке - само исключение
+        """
+        try:
+            while not self._stop.is_set():
+                batch = self.tape.read_buffer(self.batch_size)
+                if not batch:
+                    break
+                self._queue.put(batch)
+        except Exception as exc:  # noqa
+            self._queue.put(exc)
+            return
+        self._queue.put(None)
+
+    def _generate(self):
+        """
+        Генератор значений из пачек очереди с учетом времени ожидания
+        """
+        while True:
+            start = perf_counter()
+            batch = self._queue.get()
+            self.stats.read_wait += perf_counter() - start
+            if batch is None:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            self.stats.read_batches += 1
+            yield from batch
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._values)
+
+    def close(self) -> None:
+        """
+        Остановка фонового потока, непрочитанные пачки отбрасываются
+        """
+        self._values.close()
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.01)
+            except Empty:
+                pass
+        self._thread.join()
+
+
+class WriteBehind:
+    """
+    Обертка над лентой, записывающая пачки значений в фоновом потоке
+    """
+    def __init__(self, tape, depth: int, stats: Optional[IOStats] = None,
+                 batch_size: int = IO_BATCH_SIZE):
+        """
+        Инициализация и запуск фоновой записи
+        :param tape: лента (IO), открытая на запись
+        :param depth: максимальное кол-во пачек, ожидающих записи
+        :param stats: счетчики простоя
+        :param batch_size: кол-во значений в пачке
+        """
+        self.tape = tape
+        self.stats = stats if stats is not None else IOStats()
+        self.batch_size = batch_size
+        self._queue = Queue(maxsize=depth)
+        self._error = None
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Фоновая запись пачек из очереди до получения None
+        """
+        while (batch := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self.tape.write_buffer(batch)
+                except Exception as exc:  # noqa
+                    self._error = exc
+
+    def _put(self, batch: list) -> None:
+        """
+        Передача пачки фоновому потоку с учетом времени ожидания
+        :param batch: пачка значений
+        """
+        if self._error is not None:
+            raise self._error
+        start = perf_counter()
+        self._queue.put(batch)
+        self.stats.write_wait += perf_counter() - start
+        self.stats.write_batches += 1
+
+    def write_run(self, run: Iterable) -> None:
+        """
+        Метод записи отсортированной серии, длина серии
+        запоминается в tape.runs
+        :param run: значения серии
+        """
+        count = 0
+        batch = []
+        for val in run:
+            batch.append(val)
+            if len(batch) == self.batch_size:
+                self._put(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._put(batch)
+            count += len(batch)
+        self.tape.add_run(count)
+
+    def close(self) -> None:
+        """
+        Ожидание записи всех пачек и остановка фонового потока
+        """
+        start = perf_counter()
+        self._queue.put(None)
+        self._thread.join()
+        self.stats.write_wait += perf_counter() - start
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,323 @@
+import argparse
+import csv
+from datetime import datetime, timezone
+from itertools import product
+import json
+import os
+import platform
+import shutil
+import sys
+from time import perf_counter
+from typing import Iterable, Optional
+
+from external_two_way_sort.external_sort import my_sort
+from external_two_way_sort.generator import DISTRIBUTIONS, SIZE_UNITS, \
+    parse_size, write_workload
+
+DATA_TYPES = ("i", "f", "s", "csv")
+CSV_HEADER = ("a", "b", "c")
+CONFIG_FIELDS = ("data_type", "distribution", "size", "inputs", "bsize",
+                 "merge_order", "split_mode", "spill_format")
+
+
+def write_input(path: str, data_type: str, size: int, seed: int,
+                distribution: str = "uniform") -> int:
+    """
+    Потоковая запись входного файла размера не меньше size байт
+    :param path: путь к файлу
+    :param data_type: тип данных (i, f, s или csv)
+    :param size: размер файла в байтах
+    :param seed: зерно генератора, одинаковое зерно дает одинаковый файл
+    :param distribution: распределение значений (одно из DISTRIBUTIONS)
+    :return: кол-во записанных строк
+    """
+    if data_type == "csv":
+        return write_workload(path, size=size, data_type="i",
+                              distribution=distribution,
+                              columns=len(CSV_HEADER), seed=seed)
+    return write_workload(path, size=size, data_type=data_type,
+                          distribution=distribution, seed=seed)
+
+
+def prepare_inputs(workdir: str, data_type: str, size: int, inputs: int,
+                   seed: int, distribution: str = "uniform") -> list[str, ...]:
+    """
+    Подготовка входных файлов общего размера size, уже созданные
+    файлы с теми же параметрами используются повторно
+    :param workdir: каталог входных файлов
+    :param data_type: тип данных
+    :param size: общий размер входных файлов в байтах
+    :param inputs: кол-во входных файлов
+    :param seed: зерно генератора
+    :param distribution: распределение значений
+    :return: пути к входным файлам
+    """
+    ext = "csv" if data_type == "csv" else "txt"
+    paths = []
+    for num in range(inputs):
+        path = os.path.join(
+            workdir, f"{data_type}_{distribution}_{size}_{seed}_"
+                     f"{num}of{inputs}.{ext}")
+        if not os.path.isfile(path):
+            write_input(path, data_type, size // inputs, seed * 1000 + num,
+                        distribution)
+        paths.append(path)
+    return paths
+
+
+def is_sorted_file(path: str, data_type: str) -> bool:
+    """
+    Потоковая проверка упорядоченности выходного файла
+    :param path: путь к файлу
+    :param data_type: тип данных
+    :return: True, если значения (или ключи csv) не убывают
+    """
+    descr = {"i": int, "f": float, "s": str, "csv": int}[data_type]
+    prev = None
+    with open(path, "r", encoding="utf-8") as file:
+        if data_type == "csv":
+            next(file, None)
+        for line in file:
+            line = line.rstrip("\n")
+            cur = descr(line.split(",")[0] if data_type == "csv" else line)
+            if prev is not None and cur < prev:
+                return False
+            prev = cur
+    return True
+
+
+def run_case(paths: list[str, ...], output: str, config: dict) -> dict:
+    """
+    Один запуск сортировки с замером времени
+    :param paths: входные файлы
+    :param output: выходной файл
+    :param config: параметры запуска
+    :return: результат запуска: параметры, время и метрики сортировки
+    """
+    is_csv = config["data_type"] == "csv"
+    start = perf_counter()
+    stats = my_sort(paths, output,
+                    type_data="i" if is_csv else config["data_type"],
+                    key="a" if is_csv else None,
+                    bsize=config["bsize"],
+                    merge_order=config["merge_order"],
+                    split_mode=config["split_mode"],
+                    spill_format=config["spill_format"])
+    elapsed = perf_counter() - start
+    input_bytes = sum(os.path.getsize(path) for path in paths)
+    result = dict(config, **stats.totals())
+    result.update(time=elapsed, input_bytes=input_bytes,
+                  throughput_mb_s=input_bytes / SIZE_UNITS["MB"]
+                  / max(elapsed, 1e-9))
+    return result
+
+
+def run_benchmark(data_types: Iterable[str], sizes: Iterable[int],
+                  bsizes: Iterable[int], merge_orders: Iterable[int],
+                  inputs: Iterable[int],
+                  split_modes: Iterable[str] = ("block",),
+                  spill_formats: Iterable[str] = ("text",),
+                  distributions: Iterable[str] = ("uniform",),
+                  repeat: int = 1, seed: int = 0,
+                  workdir: str = "bench_data", verify: bool = False,
+                  keep_data: bool = False) -> list[dict, ...]:
+    """
+    Прогон сортировки по всем сочетаниям параметров
+    :param data_types: типы данных (i, f, s, csv)
+    :param sizes: общие размеры входных данных в байтах
+    :param bsizes: размеры буфера
+    :param merge_orders: кол-во сливаемых за раз серий
+    :param inputs: кол-во входных файлов
+    :param split_modes: способы формирования начальных серий
+    :param spill_formats: форматы временных лент
+    :param distributions: распределения входных значений
+    :param repeat: кол-во повторов каждого сочетания
+    :param seed: зерно генератора входных данных
+    :param workdir: каталог входных и выходных файлов
+    :param verify: флаг проверки упорядоченности результата
+    :param keep_data: флаг сохранения сгенерированных файлов
+    :return: результаты запусков
+    """
+    os.makedirs(workdir, exist_ok=True)
+    meta = {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": datetime.now(timezone.utc).isoformat()}
+    results = []
+    try:
+        for data_type, distribution, size, count in product(
+                data_types, distributions, sizes, inputs):
+            paths = prepare_inputs(workdir, data_type, size, count, seed,
+                                   distribution)
+            output = os.path.join(
+                workdir, "output." + ("csv" if data_type == "csv" else "txt"))
+            for bsize, merge_order, split_mode, spill_format, run in product(
+                    bsizes, merge_orders, split_modes, spill_formats,
+                    range(repeat)):
+                config = {"data_type": data_type,
+                          "distribution": distribution, "size": size,
+                          "inputs": count, "bsize": bsize,
+                          "merge_order": merge_order,
+                          "split_mode": split_mode,
+                          "spill_format": spill_format, "run": run}
+                result = dict(meta, **run_case(paths, output, config))
+                if verify:
+                    result["sorted"] = is_sorted_file(output, data_type)
+                results.append(result)
+    finally:
+        if not keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def write_results(results: list[dict, ...], path: str) -> None:
+    """
+    Запись результатов в файл: json lines (по строке на запуск)
+    или csv, если расширение файла .csv
+    :param results: результаты запусков
+    :param path: путь к файлу
+    """
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(file, list(results[0]) if results else [])
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+
+def read_results(path: str) -> list[dict, ...]:
+    """
+    Чтение результатов в формате json lines
+    :param path: путь к файлу
+    :return: результаты запусков
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def median_times(results: Iterable[dict]) -> dict[tuple, float]:
+    """
+    Медианное время по каждому сочетанию параметров
+    :param results: результаты запусков
+    :return: словарь (параметры) -> медианное время
+    """
+    times = {}
+    for result in results:
+        config = tuple(result[field] for field in CONFIG_FIELDS)
+        times.setdefault(config, []).append(result["time"])
+    return {config: sorted(values)[len(values) // 2]
+            for config, values in times.items()}
+
+
+def find_regressions(results: Iterable[dict], baseline: Iterable[dict],
+                     threshold: float = 0.1) -> list[dict, ...]:
+    """
+    Сравнение с результатами предыдущей версии
+    :param results: текущие результаты
+    :param baseline: результаты предыдущей версии
+    :param threshold: допустимое относительное замедление
+    :return: сочетания параметров, медианное время которых выросло
+    больше, чем на threshold
+    """
+    current, previous = median_times(results), median_times(baseline)
+    regressions = []
+    for config, time in current.items():
+        old_time = previous.get(config)
+        if old_time and time > old_time * (1 + threshold):
+            regressions.append(dict(zip(CONFIG_FIELDS, config), time=time,
+                                    baseline_time=old_time,
+                                    slowdown=time / old_time))
+    return regressions
+
+
+def split_list(value: str, item_type: type = str) -> list:
+    """
+    Разбор списка значений через запятую
+    :param value: строка со значениями
+    :param item_type: тип значений
+    :return: список значений
+    """
+    return [item_type(item) for item in value.split(",") if item]
+
+
+def main(argv: Optional[list[str, ...]] = None) -> int:
+    """
+    Точка входа: прогон, запись результатов и сравнение с базовыми
+    :param argv: аргументы командной строки
+    :return: код возврата, 1 - найдено замедление
+    """
+    parser = argparse.ArgumentParser(description="Замеры производительности "
+                                                 "внешней сортировки")
+    parser.add_argument("--sizes", default="1MB",
+                        help="Общие размеры входных данных через запятую, "
+                             "например 1MB,100MB,1GB")
+    parser.add_argument("--types", default="i,f,s,csv",
+                        help="Типы данных через запятую: i, f, s, csv")
+    parser.add_argument("--distribution", default="uniform",
+                        help="Распределения входных значений через запятую: "
+                             + ", ".join(DISTRIBUTIONS))
+    parser.add_argument("--bsize", default="10000",
+                        help="Размеры буфера через запятую")
+    parser.add_argument("--merge_order", default="2",
+                        help="Кол-во сливаемых серий через запятую")
+    parser.add_argument("--inputs", default="1",
+                        help="Кол-во входных файлов через запятую")
+    parser.add_argument("--split_mode", default="block",
+                        help="Способы формирования серий через запятую")
+    parser.add_argument("--spill_format", default="text",
+                        help="Форматы временных лент через запятую")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Кол-во повторов каждого сочетания")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Зерно генератора входных данных")
+    parser.add_argument("--workdir", default="bench_data",
+                        help="Каталог входных и выходных файлов")
+    parser.add_argument("--results", default="bench_results.jsonl",
+                        help="Файл результатов (.jsonl или .csv)")
+    parser.add_argument("--baseline", default=None,
+                        help="Результаты предыдущей версии (.jsonl) "
+                             "для поиска замедлений")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Допустимое относительное замедление")
+    parser.add_argument("--verify", default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="Проверять упорядоченность результата")
+    parser.add_argument("--keep_data", default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="Не удалять сгенерированные файлы")
+    args = parser.parse_args(argv)
+
+    data_types = split_list(args.types)
+    for data_type in data_types:
+        if data_type not in DATA_TYPES:
+            parser.error(f"unknown data type: {data_type}")
+    distributions = split_list(args.distribution)
+    for distribution in distributions:
+        if distribution not in DISTRIBUTIONS:
+            parser.error(f"unknown distribution: {distribution}")
+    results = run_benchmark(
+        data_types, split_list(args.sizes, parse_size),
+        split_list(args.bsize, int), split_list(args.merge_order, int),
+        split_list(args.inputs, int), split_list(args.split_mode),
+        split_list(args.spill_format), distributions, args.repeat,
+        args.seed, args.workdir, args.verify, args.keep_data)
+    write_results(results, args.results)
+    for result in results:
+        print(f"{result['data_type']} {result['distribution']} "
+              f"{result['size']} B "
+              f"x{result['inputs']} bsize={result['bsize']} "
+              f"k={result['merge_order']}: {result['time']:.3f} sec "
+              f"({result['throughput_mb_s']:.2f} MB/s)")
+
+    if args.baseline:
+        regressions = find_regressions(results, read_results(args.baseline),
+                                       args.threshold)
+        for item in regressions:
+            print(f"regression: {item}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import json
+import os
+from typing import Optional
+
+MANIFEST_VERSION = 1
+
+
+def input_fingerprint(path: str) -> dict:
+    """
+    Отпечаток входного файла, по которому проверяется, что файл
+    не изменился с момента сохранения манифеста
+    :param path: путь к файлу
+    :return: словарь с путем, размером и временем изменения файла
+    """
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns}
+
+
+def save_manifest(path: str, state: dict) -> None:
+    """
+    Атомарная запись манифеста: сначала во временный файл,
+    затем замена старого манифеста
+    :param path: путь к манифесту
+    :param state: состояние сортировки
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(dict(state, version=MANIFEST_VERSION), file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path: str) -> Optional[dict]:
+    """
+    Чтение манифеста
+    :param path: путь к манифесту
+    :return: состояние сортировки или None, если манифеста нет
+    или он поврежден
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != MANIFEST_VERSION:
+        return None
+    return state
+
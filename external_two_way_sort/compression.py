@@ -0,0 +1,46 @@
+import bz2
+import gzip
+import lzma
+import os
+from types import ModuleType
+from typing import Optional
+
+CODECS = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+
+
+def split_codec(path: str) -> tuple[str, Optional[ModuleType]]:
+    """
+    Определение сжатия файла по расширению (.gz, .bz2, .xz)
+    :param path: путь к файлу
+    :return: путь без расширения сжатия и модуль, открывающий
+    сжатый файл (None, если файл не сжат)
+    """
+    base, ext = os.path.splitext(path)
+    codec = CODECS.get(ext.lower())
+    return (base, codec) if codec is not None else (path, None)
+
+
+class CompressedFile(gzip.GzipFile):
+    """
+    Сжатый zlib (в формате gzip) временный файл, считающий объем
+    записанных в него несжатых данных
+    """
+    def __init__(self, filename: str, mode: str, level: int):
+        """
+        Открытие сжатого файла
+        :param filename: имя файла
+        :param mode: режим открытия файла (rb, wb)
+        :param level: уровень сжатия zlib (1-9)
+        """
+        super().__init__(filename, mode, compresslevel=level)
+        self.raw_bytes = 0
+
+    def write(self, data) -> int:
+        """
+        Сжатие и запись данных
+        :param data: несжатые данные
+        :return: кол-во записанных несжатых байт
+        """
+        length = super().write(data)
+        self.raw_bytes += length
+        return length
@@ -1,44 +1,73 @@
+from array import array
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 import csv
-from functools import wraps
-from io import UnsupportedOperation
+import hashlib
+import heapq
+from io import TextIOWrapper, UnsupportedOperation
+from itertools import chain, groupby, islice
+import marshal
+from operator import itemgetter
 import os
-from time import time
-from typing import Optional, Callable, Union, Iterable
-
-from external_two_way_sort.internal_sort import merge_sort
+import shutil
+import struct
+import tempfile
+from typing import Optional, Callable, Union, Iterable, Iterator
+
+from external_two_way_sort.async_io import IOStats, ReadAhead, WriteBehind
+from external_two_way_sort.checkpoint import input_fingerprint, \
+    load_manifest, save_manifest
+from external_two_way_sort.compression import CompressedFile, split_codec
+from external_two_way_sort.keys import SortKey
+from external_two_way_sort.metrics import PhaseStats, SortStats, \
+    estimate_merge_comparisons, estimate_split_comparisons
+from external_two_way_sort.internal_sort import drop_duplicates, \
+    is_sorted, natural_run_ids, replacement_selection, sort_run, top_k
 TEMP_DIR = r"temp"
 EOF = "¶"
+TXT_BLOCK_SIZE = 1 << 16
+BIN_BLOCK_SIZE = 1 << 16
+BIN_STRUCTS = {"i": struct.Struct("=q"), "f": struct.Struct("=d")}
+BIN_LEN = struct.Struct("=I")
+BIN_INT_ESCAPE = -2 ** 63
+PARTITION_EXECUTORS = ("process", "subprocess")
 CsvRow = dict[str, Union[int, float, str]]
 
 
-def timing(f: Callable):
+def pool_map(pool: Executor, func: Callable, items: Iterable,
+             depth: int) -> Iterator:
     """
-    Декоратор для вычисления времени выполнения сортировки
-    @param f: функция, время которой засекаем
+    Аналог pool.map, сохраняющий порядок результатов и держащий
+    в работе не более depth задач, чтобы не считывать весь файл в память
+    :param pool: пул исполнителей
+    :param func: выполняемая функция
+    :param items: кортежи аргументов функции
+    :param depth: максимальное кол-во одновременно отправленных задач
+    :return: генератор результатов
     """
-
-    @wraps(f)
-    def wrap(*args, **kw):
-        ts = time()
-        result = f(*args, **kw)
-        te = time()
-        print(
-            f'func: {f.__name__} '
-            f'time: {te - ts:2.4f} sec')
-        return result
-
-    return wrap
+    pending = deque()
+    for args in items:
+        pending.append(pool.submit(func, *args))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 
 class IO:
     """
-    Класс реализации ввода-вывода для txt и csv файлов
+    Класс реализации ввода-вывода для txt и csv файлов,
+    а также бинарных (.bin) временных файлов. Файлы с расширением
+    .gz, .bz2 или .xz (например, data.csv.gz) читаются и пишутся
+    потоком через соответствующий модуль сжатия
     """
     def __init__(self, filename: str, mode: str, data_type: str = "s",
                  is_temp: bool = False,
                  delimiter: str = ",",
                  header: Optional[list[str, ...]] = None,
-                 key_val: Optional[str] = None):
+                 key_val: Union[str, SortKey, None] = None,
+                 compress_level: int = 0,
+                 temp_dir: str = TEMP_DIR):
         """
         Инициализация экземпляра класса
         :param filename: имя файла
@@ -48,25 +77,37 @@ class IO:
         :param is_temp: флаг временного файла
         :param delimiter: разделитель для csv
         :param header: заголовок для csv файлов, открытых в режиме "w"
-        :param key_val: ключевое значение, по которому производится сортировка
+        :param key_val: ключ сортировки csv: описание для SortKey.parse
+        или готовый SortKey, по умолчанию первый столбец
+        :param compress_level: уровень сжатия zlib временного файла,
+        0 - без сжатия
+        :param temp_dir: каталог временного файла
         """
         self.mode = mode
         self.filename = filename
         self.is_temp = is_temp
         self.descr = {"i": int, "s": str, "f": float}[data_type]
         self.header = header
+        self.compress_level = compress_level if is_temp else 0
+        self._compressed = None
+        self.raw_size = 0
 
-        try:
-            os.mkdir(TEMP_DIR)
-        except FileExistsError:
-            pass
-
-        self.path = os.path.join(TEMP_DIR, filename) if is_temp else filename
+        if is_temp:
+            os.makedirs(temp_dir, exist_ok=True)
+        self.path = os.path.join(temp_dir, filename) if is_temp else filename
 
-        self.is_txt = self.path.endswith(".txt")
-        self.file = open(self.path, mode, newline="") if not self.is_txt \
-            else open(self.path, mode)
+        name, self._codec = split_codec(self.path)
+        self.is_bin = name.endswith(".bin")
         self.key = key_val
+        self.runs = []
+        self.records = 0
+        if self.is_bin:
+            self._init_bin(data_type)
+            return
+
+        self.is_txt = name.endswith(".txt")
+        self.file = self._open()
+        self._reset_buffer()
 
         if not self.is_txt:
             self.delimiter = delimiter
@@ -78,31 +119,200 @@ class IO:
                 self.csv_access = csv.DictWriter(self.file, header,
                                                  delimiter=delimiter)
                 self.csv_access.writeheader()
-            self.key = self.key if self.key else self.header[0]
+            self._init_key(data_type)
             if header is None and mode == "w":
                 raise TypeError("mode is write and header is not given")
 
-    def _read_txt(self) -> Union[int, float, str]:
+    def _init_bin(self, data_type: str) -> None:
+        """
+        Инициализация бинарного временного файла. Если задан заголовок,
+        файл хранит строки csv, иначе - отдельные значения
+        :param data_type: тип данных значений
+        """
+        self.is_txt = self.header is None
+        self.file = self._open()
+        self._reset_buffer()
+        self._bin_struct = None
+        if self.is_txt:
+            self._bin_struct = BIN_STRUCTS.get(data_type)
+            self._bin_dumps, self._bin_loads = str.encode, bytes.decode
+        else:
+            self._init_key(data_type)
+            self._bin_dumps, self._bin_loads = marshal.dumps, marshal.loads
+
+    def _open(self):
+        """
+        Открытие файла в текущем режиме, сжатый файл открывается
+        модулем своего формата, временный файл со сжатием - через
+        CompressedFile
+        :return: файловый объект
+        """
+        if self._codec is not None:
+            if self.is_bin:
+                return self._codec.open(self.path, self.mode + "b")
+            return self._codec.open(self.path, self.mode + "t",
+                                    newline=None if self.is_txt else "")
+        if self.compress_level:
+            self._compressed = CompressedFile(self.path, self.mode + "b",
+                                              self.compress_level)
+            if self.is_bin:
+                return self._compressed
+            return TextIOWrapper(self._compressed,
+                                 newline=None if self.is_txt else "")
+        if self.is_bin:
+            return open(self.path, self.mode + "b")
+        if self.is_txt:
+            return open(self.path, self.mode)
+        return open(self.path, self.mode, newline="")
+
+    def _init_key(self, data_type: str) -> None:
+        """
+        Инициализация ключа сортировки строк csv
+        :param data_type: тип столбцов ключа без явно указанного типа
+        """
+        self.sort_key = SortKey.parse(self.key if self.key else self.header[0],
+                                      data_type)
+        self.key = self.sort_key.names[0]
+
+    def _reset_buffer(self) -> None:
+        """
+        Сброс буфера считанных из txt или бинарного файла значений
+        """
+        self._buffer = []
+        self._buffer_pos = 0
+        self._buffer_tail = b"" if self.is_bin else ""
+        self._buffer_eof = False
+
+    def _fill_buffer(self) -> bool:
         """
-        Метод считывания одной строки из txt файла
-        :return: строка, приведенная к data_type типу
+        Метод считывания следующей пачки значений в буфер
+        :return: False, если файл закончился, True в противном случае
         """
         if self.mode != "r":
             raise UnsupportedOperation("not readable")
+        self._buffer = []
+        self._buffer_pos = 0
+        if self._buffer_eof:
+            return False
+        if self.is_bin:
+            return self._fill_bin_buffer()
+        return self._fill_txt_buffer()
+
+    def _fill_txt_buffer(self) -> bool:
+        """
+        Метод считывания блока txt файла размера TXT_BLOCK_SIZE
+        и разбора всех его полных строк в пачку значений
+        :return: False, если файл закончился, True в противном случае
+        """
+        block = self.file.read(TXT_BLOCK_SIZE)
+        lines = (self._buffer_tail + block).split("\n")
+        self._buffer_tail = lines.pop()
+        if not block:
+            self._buffer_eof = True
+            if self._buffer_tail:
+                lines.append(self._buffer_tail)
+                self._buffer_tail = ""
+
+        if "None" in lines:
+            lines = lines[:lines.index("None")]
+            self._buffer_eof = True
+
+        self._buffer = [self.descr(line) for line in lines]
+        return bool(self._buffer) or not self._buffer_eof
+
+    def _fill_bin_buffer(self) -> bool:
+        """
+        Метод считывания блока бинарного файла размера BIN_BLOCK_SIZE
+        и разбора всех его полных записей в пачку значений
+        :return: False, если файл закончился, True в противном случае
+        """
+        block = self.file.read(BIN_BLOCK_SIZE)
+        data = self._buffer_tail + block
+        if not block:
+            self._buffer_eof = True
+
+        if self._bin_struct is not None:
+            end = len(data) - len(data) % self._bin_struct.size
+            values = array(self._bin_struct.format[-1])
+            values.frombytes(data[:end])
+            if values.typecode == "q" and BIN_INT_ESCAPE in values:
+                self._buffer, end = self._unescape_ints(values, data)
+            else:
+                self._buffer = values.tolist()
+        else:
+            end = 0
+            while end + BIN_LEN.size <= len(data):
+                length, = BIN_LEN.unpack_from(data, end)
+                if end + BIN_LEN.size + length > len(data):
+                    break
+                end += BIN_LEN.size
+                self._buffer.append(self._bin_loads(data[end:end + length]))
+                end += length
+
+        self._buffer_tail = data[end:]
+        return bool(self._buffer) or not self._buffer_eof
+
+    @staticmethod
+    def _unescape_ints(values: array, data: bytes) -> tuple[list, int]:
+        """
+        Разбор блока целых чисел, среди которых есть записанные блобом
+        (см. _write_bin): за BIN_INT_ESCAPE следует длина блоба
+        и сам блоб marshal, дополненный до кратной 8 байтам длины
+        :param values: записи блока
+        :param data: байты блока
+        :return: значения и кол-во разобранных байт блока
+        """
+        size = values.itemsize
         res = []
-        while True:
-            char = self.file.read(1)
-            if char == "":
+        pos = 0
+        while pos < len(values):
+            try:
+                esc = values.index(BIN_INT_ESCAPE, pos)
+            except ValueError:
+                res.extend(values[pos:])
+                pos = len(values)
                 break
-            if char == "\n":
-                if (val := "".join(res)) != "None":
-
-                    return self.descr(val)
-                else:
-                    return EOF
-            res.append(char)
+            res.extend(values[pos:esc])
+            pos = esc
+            if esc + 1 >= len(values):
+                break
+            length = values[esc + 1]
+            start = (esc + 2) * size
+            if esc + 2 + -(-length // size) > len(values):
+                break
+            res.append(marshal.loads(data[start:start + length]))
+            pos = esc + 2 + -(-length // size)
+        return res, pos * size
 
-        return EOF
+    def _read_buffered(self) -> Union[int, float, str]:
+        """
+        Метод считывания одного значения из буфера txt или бинарного файла
+        :return: значение, приведенное к data_type типу
+        """
+        while self._buffer_pos >= len(self._buffer):
+            if not self._fill_buffer():
+                return EOF
+        val = self._buffer[self._buffer_pos]
+        self._buffer_pos += 1
+        return val
+
+    def _read_buffered_list(self, buffer_size: int) \
+            -> list[Union[int, float, str], ...]:
+        """
+        Метод считывания значений из txt или бинарного файла срезами буфера
+        :param buffer_size: сколько строк файла нужно считать
+        :return: список значений
+        """
+        res = []
+        while len(res) < buffer_size:
+            if self._buffer_pos >= len(self._buffer):
+                if not self._fill_buffer():
+                    break
+                continue
+            end = self._buffer_pos + buffer_size - len(res)
+            res.extend(self._buffer[self._buffer_pos:end])
+            self._buffer_pos = min(end, len(self._buffer))
+        return res
 
     def _read_csv(self) -> Union[str, CsvRow]:
         """
@@ -112,8 +322,7 @@ class IO:
         if self.mode != "r":
             raise UnsupportedOperation("not readable")
         try:
-            res = next(self.csv_access)  # noqa
-            res[self.key] = self.descr(res[self.key])
+            res = self.sort_key.convert(next(self.csv_access))  # noqa
         except StopIteration:
             return EOF
         return res
@@ -123,22 +332,22 @@ class IO:
         Универсальный метод чтения для любых файлов
         :return: считанное значение
         """
-        if self.is_txt:
-            return self._read_txt()
+        if self.is_txt or self.is_bin:
+            return self._read_buffered()
         else:
             return self._read_csv()
 
-    def _is_txt_empty(self) -> bool:
+    def _is_stream_empty(self) -> bool:
         """
-        Проверка txt файла на пустоту
+        Проверка txt или бинарного файла на пустоту по первому символу
+        (байту)
         :return: True если файл пустой, False в противном случае
         """
         self.file.seek(0, 0)
-        data = self.file.read()
+        empty = not self.file.read(1)
         self.file.seek(0, 0)
-        if not data:
-            return True
-        return False
+        self._reset_buffer()
+        return empty
 
     def _is_csv_empty(self) -> bool:
         """
@@ -158,13 +367,24 @@ class IO:
 
     def is_empty(self) -> bool:
         """
-        Универсальный метод проверки на пустот для txt и csv
+        Универсальный метод проверки на пустот для txt и csv.
+        Для временных лент используется кол-во записанных значений,
+        файл при этом не читается
         :return: True если файл пустой, False в противном случае
         """
-        if self.is_txt:
-            return self._is_txt_empty()
-        else:
-            return self._is_csv_empty()
+        if self.is_temp:
+            return self.records == 0
+        if self.is_bin or self.is_txt:
+            return self._is_stream_empty()
+        return self._is_csv_empty()
+
+    def __iter__(self):
+        """
+        Итератор по значениям файла до конца ленты
+        :return: генератор считанных значений
+        """
+        while (val := self.read()) != EOF:
+            yield val
 
     def read_buffer(self, buffer_size: int)\
             -> list[Union[str, int, float, CsvRow], ...]:
@@ -173,6 +393,8 @@ class IO:
         :param buffer_size: сколько строк файла нужно считать
         :return: список со строками файла
         """
+        if self.is_txt or self.is_bin:
+            return self._read_buffered_list(buffer_size)
         res = []
         for i in range(buffer_size):
             num = self.read()
@@ -185,13 +407,20 @@ class IO:
     def change_mode(self, new_mode: str) -> None:
         """
         Метод смены режима файла с чтения на запись и обратно
-        :param new_mode: новый режим
+        :param new_mode: новый режим. При закрытии сжатого файла
+        после записи в raw_size запоминается объем записанного до сжатия
         """
-        self.mode = new_mode
         self.file.close()
+        if self._compressed is not None and self.mode == "w":
+            self.raw_size = self._compressed.raw_bytes
+        self.mode = new_mode
+        if new_mode == "w":
+            self.runs = []
+            self.records = 0
+        self._reset_buffer()
 
-        if not self.is_txt:
-            self.file = open(self.path, self.mode, newline="")
+        self.file = self._open()
+        if not self.is_txt and not self.is_bin:
             if new_mode == "r":
                 self.csv_access = csv.DictReader(self.file,
                                                  delimiter=self.delimiter)
@@ -199,8 +428,6 @@ class IO:
                 self.csv_access = csv.DictWriter(self.file, self.header,
                                                  delimiter=self.delimiter)
                 self.csv_access.writeheader()
-        else:
-            self.file = open(self.path, self.mode)
 
     def _write_txt(self, val: Union[str, int, float]) -> None:
         """
@@ -209,6 +436,32 @@ class IO:
         """
         self.file.write(f"{val}\n")
 
+    def _write_bin(self, val: Union[str, int, float, CsvRow]) -> None:
+        """
+        Метод для записи значения в бинарный файл: числа упаковываются
+        в запись фиксированной длины, строки и строки csv - в блоб
+        с префиксом длины. Целые, не помещающиеся в 64 бита (и само
+        BIN_INT_ESCAPE), записываются блобом marshal после записи
+        BIN_INT_ESCAPE и длины блоба, дополненным до кратной 8 байтам длины
+        :param val: значение
+        """
+        if self._bin_struct is not None:
+            try:
+                if val == BIN_INT_ESCAPE:
+                    raise struct.error("escape value")
+                self.file.write(self._bin_struct.pack(val))
+            except struct.error:
+                if self._bin_struct.format[-1] != "q":
+                    raise
+                blob = marshal.dumps(val)
+                self.file.write(self._bin_struct.pack(BIN_INT_ESCAPE))
+                self.file.write(self._bin_struct.pack(len(blob)))
+                self.file.write(blob.ljust(-(-len(blob) // 8) * 8, b"\0"))
+        else:
+            blob = self._bin_dumps(val)
+            self.file.write(BIN_LEN.pack(len(blob)))
+            self.file.write(blob)
+
     def _write_csv(self, row: CsvRow) -> None:
         """
         Метод для записи значения в csv файл
@@ -223,7 +476,9 @@ class IO:
         """
         if self.mode != "w":
             raise UnsupportedOperation("not writable")
-        if self.is_txt:
+        if self.is_bin:
+            self._write_bin(val)
+        elif self.is_txt:
             self._write_txt(val)
         else:
             self._write_csv(val)
@@ -233,8 +488,8 @@ class IO:
         Метод копирования текущего txt файла в другой
         :param out_file: файл, в который копируем
         """
-        while (char := self.file.read()) != "":
-            out_file.file.write(char)
+        while (block := self.file.read(TXT_BLOCK_SIZE)) != "":
+            out_file.file.write(block)
 
     def _csv_copy_to(self, out_file) -> None:
         """
@@ -251,300 +506,946 @@ class IO:
         """
         out_file.change_mode("w")
         self.change_mode("r")
-        if self.is_txt:
+        if self.is_txt and not self.is_bin:
             self._txt_copy_to(out_file)
         else:
             self._csv_copy_to(out_file)
 
     def write_buffer(self,
-                     buffer: list[Union[int, float, str, CsvRow], ...]) -> None:
+                     buffer: Iterable[Union[int, float, str, CsvRow]]) -> None:
         """
         Метод записи списка значений в файл
         :param buffer: список значений
         """
-        for el in buffer:
+        if self.mode != "w":
+            raise UnsupportedOperation("not writable")
+        if self.is_bin and isinstance(buffer, array) \
+                and self._bin_struct is not None \
+                and buffer.typecode == self._bin_struct.format[-1] \
+                and not (buffer.typecode == "q" and BIN_INT_ESCAPE in buffer):
+            self.file.write(buffer.tobytes())
+        elif self.is_txt and not self.is_bin:
+            self.file.write("".join(f"{val}\n" for val in buffer))
+        else:
+            for el in buffer:
+                self.write(el)
+
+    def write_run(self,
+                  run: Iterable[Union[int, float, str, CsvRow]]) -> None:
+        """
+        Метод записи отсортированной серии в файл,
+        длина серии запоминается в self.runs
+        :param run: значения серии
+        """
+        if isinstance(run, (list, array)):
+            self.write_buffer(run)
+            self.add_run(len(run))
+            return
+        count = 0
+        for el in run:
             self.write(el)
+            count += 1
+        self.add_run(count)
+
+    def add_run(self, length: int) -> None:
+        """
+        Учет записанной серии: длина серии и общее кол-во значений ленты
+        :param length: длина серии
+        """
+        self.runs.append(length)
+        self.records += length
+
+    def set_runs(self, runs: list[int, ...]) -> None:
+        """
+        Восстановление длин серий уже записанной ленты,
+        например, из манифеста или дочернего процесса
+        :param runs: длины серий
+        """
+        self.runs = list(runs)
+        self.records = sum(runs)
+
+    @property
+    def size(self) -> int:
+        """
+        Размер файла на диске в байтах, без чтения файла. Сжатые
+        выходные файлы (.gz, .bz2, .xz) держат часть данных в буфере
+        кодека до закрытия, поэтому их размер точен только после
+        закрытия self.file
+        :return: кол-во байт
+        """
+        if self.file.closed:
+            return os.path.getsize(self.path)
+        if self.mode == "w" and self._compressed is None \
+                and self._codec is None:
+            self.file.flush()
+        return os.fstat(self.file.fileno()).st_size
 
     def __repr__(self) -> str:
         return f"'{self.filename}'(mode: {self.mode}, is_temp: {self.is_temp})"
 
     def __del__(self) -> None:
         self.file.close()
-        # print("123", self.is_txt)
-        if self.is_temp:
-            os.remove(self.path)
+        if not self.is_temp:
+            return
         try:
-            if not os.listdir(TEMP_DIR):
-                os.rmdir(TEMP_DIR)
+            os.remove(self.path)
         except FileNotFoundError:
             pass
+        try:
+            os.rmdir(os.path.dirname(self.path))
+        except OSError:
+            pass
 
 
-def generate_input(file_name="input.txt"):
+def generate_input(file_name="input.txt", rows: int = 200,
+                   distribution: str = "uniform",
+                   seed: Optional[int] = None):
     """
-    Генерация случайного входного txt файла
+    Генерация входного txt файла
     :param file_name: имя файла
+    :param rows: кол-во строк
+    :param distribution: распределение значений (см. generator.DISTRIBUTIONS)
+    :param seed: зерно генератора
     """
-    from random import shuffle, randint
-    with open(file_name, "w") as file:
-        res = [randint(-100, 1000) for _ in range(1, 201)]
-        shuffle(res)
-        for i in res:
-            file.write(f"{i}\n")
+    from external_two_way_sort.generator import write_workload
+    write_workload(file_name, rows, data_type="i",
+                   distribution=distribution, seed=seed)
 
 
-def generate_csv_input(file_name="input.csv", delimiter=","):
+def generate_csv_input(file_name="input.csv", delimiter=",", rows: int = 200,
+                       distribution: str = "uniform",
+                       seed: Optional[int] = None):
     """
-    Генерация случайного входного csv файла
+    Генерация входного csv файла со столбцами a, b, c, d
     :param file_name: имя файла
     :param delimiter: разделитель между столбцами
+    :param rows: кол-во строк
+    :param distribution: распределение значений первого столбца
+    :param seed: зерно генератора
+    """
+    from external_two_way_sort.generator import write_workload
+    write_workload(file_name, rows, data_type="i", distribution=distribution,
+                   columns=4, delimiter=delimiter, seed=seed)
+
+
+def make_spill_dir(base: str, name: Optional[str] = None) -> str:
+    """
+    Создание отдельного каталога временных лент одной сортировки.
+    Базовый каталог может быть одновременно удален другой
+    завершившейся сортировкой, тогда он создается заново
+    :param base: базовый каталог временных файлов
+    :param name: имя каталога, по умолчанию - уникальное
+    :return: путь к созданному каталогу
+    """
+    while True:
+        os.makedirs(base, exist_ok=True)
+        if name is not None:
+            path = os.path.join(base, name)
+            os.makedirs(path, exist_ok=True)
+            return path
+        try:
+            return tempfile.mkdtemp(prefix="sort_", dir=base)
+        except FileNotFoundError:
+            continue
+
+
+def remove_spill_dir(path: str, remove_base: bool = False) -> None:
+    """
+    Удаление каталога временных лент сортировки вместе с манифестами
+    :param path: каталог временных лент
+    :param remove_base: флаг удаления базового каталога, если в нем
+    не осталось каталогов других сортировок. Задается только для
+    TEMP_DIR по умолчанию: каталог, указанный пользователем, остается
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    if not remove_base:
+        return
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def checkpoint_dir_name(src: list[str, ...], output: Optional[str]) -> str:
+    """
+    Имя каталога лент сортировки с сохранением манифестов, одинаковое
+    при перезапуске той же сортировки
+    :param src: исходные файлы
+    :param output: выходной файл
+    :return: имя каталога
+    """
+    paths = [os.path.abspath(path) for path in src]
+    paths.append(os.path.abspath(output) if output else "")
+    digest = hashlib.sha1("\n".join(paths).encode()).hexdigest()
+    return f"sort_{digest[:16]}"
+
+
+def manifest_path(file_num: Union[int, str],
+                  temp_dir: str = TEMP_DIR) -> str:
+    """
+    Путь к манифесту сортировки входного файла
+    :param file_num: номер входного файла
+    :param temp_dir: каталог временных лент сортировки
+    :return: путь к манифесту в каталоге временных лент
+    """
+    return os.path.join(temp_dir, f"manifest_{file_num}.json")
+
+
+def external_sort(inp: Union[IO, Iterable], file_num: Union[int, str] = 1,
+                  **params) -> IO:
+    """
+    Функция внешней сортировки одного файла до одной серии
+    :param inp: входной файл или итерируемый объект значений
+    :param file_num: номер входного файла, используется в именах лент
+    :param params: параметры external_sort_runs, кроме final_runs
+    :return: файл, в котором хранятся отсортированные значения
+    """
+    return external_sort_runs(inp, file_num, **params)[0]
+
+
+def external_sort_runs(inp: Union[IO, Iterable],
+                       file_num: Union[int, str] = 1,
+                       type_data: str = "s",
+                       reverse: bool = False,
+                       key: Union[str, SortKey, None] = None,
+                       header: Optional[list[str, ...]] = None,
+                       delimiter: str = ",",
+                       bsize: int = 1000,
+                       merge_order: int = 2,
+                       split_mode: str = "block",
+                       spill_format: str = "text",
+                       workers: int = 1,
+                       io_queue_depth: int = 0,
+                       io_stats: Optional[IOStats] = None,
+                       limit: Optional[int] = None,
+                       unique: Optional[str] = None,
+                       compress_level: int = 0,
+                       checkpoint: bool = False,
+                       resume: bool = False,
+                       temp_dir: str = TEMP_DIR,
+                       stats: Optional[SortStats] = None,
+                       final_runs: int = 1) -> list[IO, ...]:
+    """
+    Функция внешней сортировки одного файла: проходы слияния
+    выполняются, пока серий больше final_runs
+    :param inp: входной файл или итерируемый объект значений
+    (строк csv, если задан header)
+    :param file_num: номер входного файла, используется в именах лент
+    :param type_data: тип считываемых данных
+    :param reverse: флаг сортировки по невозрастанию
+    :param key: ключ сортировки для csv (описание или SortKey)
+    :param header: заголовок csv файла
+    :param delimiter: разделитель между столбцами для csv
+    :param bsize: размер буфера, для внутренней сортировки
+    :param merge_order: кол-во сливаемых за раз серий
+    :param split_mode: способ формирования начальных серий
+    :param spill_format: формат временных лент
+    :param workers: кол-во процессов, сортирующих начальные серии
+    :param io_queue_depth: глубина очередей фонового чтения и записи лент
+    при слиянии, 0 - синхронный ввод-вывод
+    :param io_stats: счетчики простоя в ожидании ввода-вывода
+    :param limit: кол-во первых значений, которые нужно получить:
+    серии обрезаются до limit значений при формировании и слиянии
+    :param unique: удаление дубликатов при формировании и слиянии серий:
+    None - не удалять, "first"/"last" - оставлять первое/последнее
+    из равных значений
+    :param compress_level: уровень сжатия zlib временных лент,
+    0 - без сжатия
+    :param checkpoint: флаг сохранения манифеста после каждого прохода,
+    ленты при этом не удаляются автоматически (только для файлов)
+    :param resume: флаг продолжения сортировки с последнего
+    завершенного прохода по сохраненному манифесту
+    :param temp_dir: каталог временных лент
+    :param stats: метрики, в которые добавляются фазы формирования
+    серий и проходов слияния
+    :param final_runs: кол-во серий, на котором слияние останавливается
+    (не больше merge_order), 1 - полная сортировка
+    :return: файлы, в которых хранятся итоговые серии, по одной на файл
+    (при одной серии - файл с отсортированными значениями)
+    """
+    stats = stats if stats is not None else SortStats(io_stats)
+    checkpoint = checkpoint and isinstance(inp, IO)
+    settings = {"type_data": type_data, "reverse": reverse, "key": repr(key),
+                "header": header, "bsize": bsize, "merge_order": merge_order,
+                "split_mode": split_mode, "spill_format": spill_format,
+                "limit": limit, "unique": unique,
+                "compress_level": compress_level}
+    state = None
+    if checkpoint:
+        fingerprint = input_fingerprint(inp.path)
+        if resume:
+            state = load_manifest(manifest_path(file_num, temp_dir))
+        if state is not None and (
+                state["settings"] != settings
+                or not state["done"] and state["input"] != fingerprint):
+            state = None
+
+    if isinstance(inp, IO):
+        if state is None and inp.is_empty():
+            return [inp]
+        is_txt = inp.is_txt
+        read_chunk = inp.read_buffer
+    else:
+        inp = iter(inp)
+        is_txt = header is None
+
+        def read_chunk(size: int) -> list:
+            return list(islice(inp, size))
+
+    file_ext = "txt" if is_txt else "csv"
+    if spill_format == "binary":
+        file_ext = "bin"
+    sort_key = None if is_txt else SortKey.parse(key if key else header[0],
+                                                 type_data)
+    if split_mode == "natural" and isinstance(inp, IO) and state is None \
+            and limit is None and unique is None:
+        already_sorted = is_sorted(inp, sort_key, reverse)
+        inp.change_mode("r")
+        if already_sorted:
+            return [inp]
+
+    if state is not None:
+        tapes = [IO(name, "r", type_data, is_temp=True, header=header,
+                    key_val=sort_key, delimiter=delimiter,
+                    compress_level=compress_level, temp_dir=temp_dir)
+                 for name in state["tapes"]]
+        for tape, tape_runs in zip(tapes, state["tape_runs"]):
+            tape.set_runs(tape_runs)
+        pass_num, runs, result_num = \
+            state["pass_num"], state["runs"], state["result"]
+    else:
+        tapes = [IO(f"line{i}_{file_num}.{file_ext}", "w", type_data,
+                    is_temp=True, header=header, key_val=sort_key,
+                    delimiter=delimiter, compress_level=compress_level,
+                    temp_dir=temp_dir)
+                 for i in range(1, 2 * merge_order + 1)]
+        pass_num, runs, result_num = 1, 0, 0
+    if checkpoint:
+        for tape in tapes:
+            tape.is_temp = False
+
+    def save_state() -> None:
+        """
+        Сохранение манифеста после завершенного прохода:
+        лент, длин их серий и номера следующего прохода
+        """
+        if not checkpoint:
+            return
+        save_manifest(manifest_path(file_num, temp_dir), {
+            "input": fingerprint, "settings": settings,
+            "tapes": [tape.filename for tape in tapes],
+            "tape_runs": [tape.runs for tape in tapes],
+            "pass_num": pass_num, "runs": runs, "result": result_num,
+            "done": runs <= 1})
+
+    def trim(run: Iterable) -> Iterable:
+        """
+        Удаление дубликатов из серии и обрезка серии до limit значений
+        :param run: значения серии
+        :return: не более limit первых значений серии
+        """
+        if unique is not None:
+            run = drop_duplicates(run, sort_key, unique)
+        if limit is None:
+            return run
+        if isinstance(run, (list, array)):
+            return run[:limit] if len(run) > limit else run
+        return islice(run, limit)
+
+    def close_pass(written: list[IO, ...], num: int) -> None:
+        """
+        Закрытие на запись лент, записанных за проход, чтобы данные
+        были сброшены на диск и был известен их итоговый размер,
+        и учет их сжатия
+        :param written: ленты, записанные за проход
+        :param num: номер прохода, 0 - формирование начальных серий
+        """
+        for tape in written:
+            tape.change_mode("r")
+        if compress_level and io_stats is not None:
+            io_stats.add_spill_pass(
+                file_num, num, sum(tape.raw_size for tape in written),
+                sum(os.path.getsize(tape.path) for tape in written))
+
+    def chunks() -> Iterator[tuple]:
+        """
+        Генератор аргументов sort_run для блоков исходной ленты длины bsize
+        :return: генератор кортежей аргументов
+        """
+        while True:
+            buf = read_chunk(bsize)
+            if buf:
+                yield buf, type_data, sort_key, reverse
+            if len(buf) != bsize:
+                return
+
+    def split() -> int:
+        """
+        Функция предварительного разделения содержимого
+        исходной ленты на merge_order других лент поочередно,
+        сортирующая серии длины bsize (в workers процессах),
+        формирующая их выбором с замещением или
+        разбивающая ленту на естественные серии
+        :return: кол-во записанных серий
+        """
+        runs_count = 0
+
+        if split_mode != "block":
+            if split_mode == "replacement":
+                run_ids = replacement_selection(inp, bsize, sort_key, reverse)
+            else:
+                run_ids = natural_run_ids(inp, sort_key, reverse)
+            for run_num, run in groupby(run_ids, key=itemgetter(0)):
+                tapes[run_num % merge_order].write_run(
+                    trim(val for _, val in run))
+                runs_count += 1
+            return runs_count
+
+        if workers == 1:
+            for buf in chunks():
+                tapes[runs_count % merge_order].write_run(
+                    trim(sort_run(*buf)))
+                runs_count += 1
+            return runs_count
+
+        with ProcessPoolExecutor(workers) as pool:
+            for run in pool_map(pool, sort_run, chunks(), 2 * workers):
+                tapes[runs_count % merge_order].write_run(trim(run))
+                runs_count += 1
+        return runs_count
+
+    def merge(item: PhaseStats) -> int:
+        """
+        Функция слияния серий из merge_order лент
+        в другие merge_order лент поочередно
+        :param item: метрики прохода
+        :return: кол-во серий после прохода
+        """
+        if pass_num % 2 != 0:
+            read_tapes = tapes[:merge_order]
+            write_tapes = tapes[merge_order:]
+        else:
+            read_tapes = tapes[merge_order:]
+            write_tapes = tapes[:merge_order]
+        for tape in read_tapes:
+            tape.change_mode("r")
+        for tape in write_tapes:
+            tape.change_mode("w")
+        item.add_input(read_tapes)
+        item.estimated_comparisons = estimate_merge_comparisons(read_tapes)
+
+        if io_queue_depth:
+            readers = [ReadAhead(tape, io_queue_depth, io_stats)
+                       for tape in read_tapes]
+            writers = [WriteBehind(tape, io_queue_depth, io_stats)
+                       for tape in write_tapes]
+        else:
+            readers = [iter(tape) for tape in read_tapes]
+            writers = write_tapes
+        new_runs_count = max(len(tape.runs) for tape in read_tapes)
+
+        for run_num in range(new_runs_count):
+            seqs = [islice(reader, tape.runs[run_num])
+                    for reader, tape in zip(readers, read_tapes)
+                    if run_num < len(tape.runs)]
+            writers[run_num % merge_order].write_run(
+                trim(heapq.merge(*seqs, key=sort_key, reverse=reverse)))
+            if limit is not None:
+                for seq in seqs:
+                    deque(seq, maxlen=0)
+
+        if io_queue_depth:
+            for pipe in readers + writers:
+                pipe.close()
+        close_pass(write_tapes, pass_num)
+        item.add_output(write_tapes)
+        return new_runs_count
+
+    if state is None:
+        with stats.phase("split", file_num) as item:
+            if isinstance(inp, IO):
+                item.add_input([inp])
+            runs = split()
+            close_pass(tapes[:merge_order], 0)
+            item.add_output(tapes[:merge_order])
+            item.estimated_comparisons = estimate_split_comparisons(
+                chain.from_iterable(tape.runs for tape in tapes[:merge_order]),
+                split_mode, bsize)
+        save_state()
+
+    while runs > final_runs:
+        with stats.phase("merge", file_num, pass_num) as item:
+            runs = merge(item)
+        result_num = merge_order if pass_num % 2 != 0 else 0
+        pass_num += 1
+        save_state()
+
+    if runs > 1:
+        return [tape for tape in tapes[result_num:result_num + merge_order]
+                if tape.runs]
+    result_file = tapes[result_num]
+    result_file.change_mode("r")
+    return [result_file]
+
+
+def external_sort_job(path: str, file_num: int,
+                      params: dict) \
+        -> tuple[Optional[str], list[int, ...], SortStats]:
     """
-    from random import randint
-    rows = list("abcd")
-    with open(file_name, "w", newline="") as file:
-        writer = csv.DictWriter(file, rows, delimiter=delimiter)
-        writer.writeheader()
-        for _ in range(200):
-            writer.writerow({row: randint(-100, 1000) for row in rows})
+    Функция внешней сортировки одного файла в отдельном процессе.
+    Итоговая лента не удаляется при завершении процесса,
+    её открывает и удаляет вызывающий процесс
+    :param path: путь к входному файлу
+    :param file_num: номер входного файла
+    :param params: параметры external_sort
+    :return: имя итоговой временной ленты (None, если входной файл
+    уже отсортирован), длины её серий и метрики сортировки
+    """
+    inp = IO(path, "r", params["type_data"], delimiter=params["delimiter"],
+             key_val=params["key"])
+    stats = SortStats()
+    result_file = external_sort(inp, file_num, io_stats=stats.io,
+                                stats=stats, **params)
+    if result_file is inp:
+        return None, [], stats
+    result_file.is_temp = False
+    return result_file.filename, result_file.runs, stats
 
 
-# @timing
 def my_sort(src: Union[Iterable, str] = "input.txt",
             output: Optional[str] = None,
             reverse: bool = False,
             type_data: Optional[str] = None,
             key: Optional[str] = None,
             delimiter: str = ",",
-            bsize=1000) -> None:
+            bsize=1000,
+            merge_order: int = 2,
+            split_mode: str = "block",
+            spill_format: str = "text",
+            workers: int = 1,
+            file_workers: int = 1,
+            io_queue_depth: int = 0,
+            io_stats: Optional[IOStats] = None,
+            merge_output: bool = False,
+            limit: Optional[int] = None,
+            unique: Optional[str] = None,
+            compress_level: int = 0,
+            checkpoint: bool = False,
+            resume: bool = False,
+            temp_dir: Optional[str] = None,
+            on_phase: Optional[Callable[[PhaseStats], None]] = None,
+            partitions: int = 1,
+            partition_executor: str = "process") \
+        -> SortStats:
     """
     Функция сортировки, реализующая алгоритм
-    сбалансированной двухпутевой сортировки слиянием
-    :param src: исходный файл(ы)
-    :param output: выходной файл
+    сбалансированной многопутевой сортировки слиянием
+    :param src: исходный файл(ы), в том числе сжатые (.gz, .bz2, .xz)
+    :param output: выходной файл, при расширении .gz, .bz2 или .xz
+    записывается сжатым
     :param reverse: флаг сортировки по невозрастанию
     :param type_data: тип считываемых данных
-    :param key: имя столбца по которому производим сортировку для csv
+    :param key: ключ сортировки для csv: имена столбцов через запятую,
+    у каждого можно указать тип и порядок, например "b:i:desc,a"
     :param delimiter: разделитель между столбцами для csv
     :param bsize: размер буфера, для внутренней сортировки
+    (при workers > 1 - размер серии, сортируемой одним процессом)
+    :param merge_order: кол-во сливаемых за раз серий (2 - двухпутевое слияние)
+    :param split_mode: способ формирования начальных серий:
+    "block" - серии длины bsize, "replacement" - выбор с замещением
+    через кучу размера bsize, "natural" - естественные серии исходного
+    файла, уже отсортированный файл не копируется на временные ленты
+    :param spill_format: формат временных лент: "text" - как у исходного
+    файла, "binary" - упакованные записи без повторного разбора значений
+    :param workers: кол-во процессов, сортирующих начальные серии
+    при split_mode="block", при partitions > 1 - кол-во одновременно
+    сортируемых диапазонов
+    :param file_workers: кол-во процессов, одновременно сортирующих
+    разные исходные файлы
+    :param io_queue_depth: глубина очередей фонового чтения и записи лент
+    при слиянии, 0 - синхронный ввод-вывод
+    :param io_stats: счетчики, в которые добавляется время простоя
+    в ожидании ввода-вывода
+    :param merge_output: флаг того, что существующий выходной файл уже
+    отсортирован: сортируются только исходные файлы, а затем
+    за один проход сливаются с ним
+    :param limit: кол-во первых в порядке сортировки значений, которые
+    нужно записать. Если limit не больше bsize, значения отбираются
+    за один проход через кучу, иначе выполняется внешняя сортировка,
+    при которой серии обрезаются до limit значений
+    :param unique: режим удаления дубликатов (по значению или по ключу
+    csv): None - не удалять, "first"/"last" - оставлять первое/последнее
+    в порядке исходных файлов из равных значений. Дубликаты удаляются
+    уже при формировании серий, поэтому каждый следующий проход
+    слияния обрабатывает меньше данных
+    :param compress_level: уровень сжатия zlib (1-9) временных лент,
+    0 - без сжатия. Объем лент до и после сжатия по проходам
+    добавляется в io_stats.spill_passes
+    :param checkpoint: флаг сохранения манифеста (номер прохода, ленты
+    и длины их серий) после каждого прохода сортировки каждого файла.
+    При падении сортировки ленты и манифест остаются во временном
+    каталоге, после успешного завершения удаляются
+    :param resume: флаг продолжения прерванной сортировки с последнего
+    завершенного прохода, включает checkpoint. Если манифеста нет,
+    входной файл или параметры изменились, сортировка начинается заново
+    :param temp_dir: базовый каталог временных файлов (по умолчанию
+    TEMP_DIR). Каждая сортировка создает в нем свой каталог лент,
+    поэтому несколько сортировок могут выполняться одновременно.
+    При checkpoint имя каталога определяется исходными и выходным
+    файлами, чтобы перезапуск нашел манифест
+    :param on_phase: функция, вызываемая с метриками (PhaseStats) каждой
+    завершенной фазы сортировки
+    :param partitions: кол-во диапазонов ключей при сортировке
+    с разбиением (см. partition.partitioned_sort): значения всех
+    исходных файлов раскладываются по диапазонам, которые сортируются
+    параллельно и записываются в output друг за другом без итогового
+    слияния. 1 - сортировка без разбиения
+    :param partition_executor: способ запуска сортировок диапазонов:
+    "process" - пул процессов, "subprocess" - отдельные процессы
+    интерпретатора, получающие задание через файл
+    :return: метрики сортировки по фазам: формирование серий, проходы
+    слияния, итоговое слияние и копирование результата во входной файл
     """
     if output == "":
         output = None
+    if merge_output and output is None:
+        raise ValueError("merge_output requires output")
+    if merge_order < 2:
+        raise ValueError("merge_order must be at least 2")
+    if split_mode not in ("block", "replacement", "natural"):
+        raise ValueError(f"unknown split_mode: {split_mode}")
+    if spill_format not in ("text", "binary"):
+        raise ValueError(f"unknown spill_format: {spill_format}")
+    if workers < 1 or file_workers < 1:
+        raise ValueError("workers and file_workers must be positive")
+    if io_queue_depth < 0:
+        raise ValueError("io_queue_depth must not be negative")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+    if unique not in (None, "first", "last"):
+        raise ValueError(f"unknown unique mode: {unique}")
+    if not 0 <= compress_level <= 9:
+        raise ValueError("compress_level must be between 0 and 9")
+    if partitions < 1:
+        raise ValueError("partitions must be positive")
+    if partitions > 1 and output is None:
+        raise ValueError("partitions require output")
+    if partitions > 1 and (checkpoint or resume):
+        raise ValueError("checkpoint is not supported with partitions")
+    if partition_executor not in PARTITION_EXECUTORS:
+        raise ValueError(f"unknown partition_executor: {partition_executor}")
+    io_stats = io_stats if io_stats is not None else IOStats()
+    stats = SortStats(io_stats, [on_phase] if on_phase is not None else [])
+    checkpoint = checkpoint or resume
 
     input_files = []
-    if not isinstance(src, str):
-        for file in src:
-            input_files.append(IO(file, "r", type_data, delimiter=delimiter))
-    else:
-        input_files.append(IO(src, "r", type_data, delimiter=delimiter))
+    if isinstance(src, str):
+        src = [src]
+    for file in src:
+        input_files.append(IO(file, "r", type_data, delimiter=delimiter,
+                              key_val=key))
 
     header = None
     if not input_files[0].is_txt:
         header = input_files[0].header
-        if key is None:
-            key = header[0]
-    file_ext = "txt" if input_files[0].is_txt else "csv"
-
-    def external_sort(inp: IO, file_num: int = 1):
-        """
-        Функция внешней сортировки одного файла
-        :param inp: входной файл
-        :param file_num: номер входного файла
-        :return: файл, в котором хранятся отсортированные значения
-        """
-        if inp.is_empty():
-            return inp
-
-        is_txt = inp.is_txt
-        tape1 = IO(f"line1_{file_num}.{file_ext}", "w", type_data,
-                   is_temp=True, header=header, key_val=key, delimiter=delimiter)
-        tape2 = IO(f"line2_{file_num}.{file_ext}", "w", type_data,
-                   is_temp=True, header=header, key_val=key, delimiter=delimiter)
-        tape3 = IO(f"line3_{file_num}.{file_ext}", "w", type_data,
-                   is_temp=True, header=header, key_val=key, delimiter=delimiter)
-        tape4 = IO(f"line4_{file_num}.{file_ext}", "w", type_data,
-                   is_temp=True, header=header, key_val=key, delimiter=delimiter)
-        pass_num = 1
-
-        def cmp(val1, val2):
-            if is_txt:
-                return val1 > val2 if reverse else val1 < val2
-            return val1[key] > val2[key] if reverse else val1[key] < val2[key]
-
-        def split():
-            """
-            Функция предварительного разделения содержимого
-            исходной ленты на две другие ленты, сортирующая серии длины bsize
-            """
-            is_tape1 = True
-
-            while True:
-                buf = inp.read_buffer(bsize)
-                merge_sort(buf, cmp=cmp)
-                if is_tape1:
-                    tape1.write_buffer(buf)
-                else:
-                    tape2.write_buffer(buf)
-
-                is_tape1 = not is_tape1
-
-                if len(buf) != bsize:
-                    break
+        key = input_files[0].sort_key
+    params = {"type_data": type_data, "reverse": reverse, "key": key,
+              "header": header, "delimiter": delimiter, "bsize": bsize,
+              "merge_order": merge_order, "split_mode": split_mode,
+              "spill_format": spill_format, "workers": workers,
+              "io_queue_depth": io_queue_depth, "limit": limit,
+              "unique": unique, "compress_level": compress_level,
+              "checkpoint": checkpoint, "resume": resume}
+    temp_dir = temp_dir if temp_dir else TEMP_DIR
+
+    if limit is not None and limit <= bsize and unique is None:
+        sort_key = None if header is None else key
+        if output is None:
+            for n, file in enumerate(input_files):
+                with stats.phase("top_k", n) as item:
+                    item.add_input([file])
+                    top = top_k(file, limit, sort_key, reverse)
+                    file.change_mode("w")
+                    file.write_run(top)
+                    file.file.close()
+                    item.add_output([file])
+            return stats.finish()
+        with stats.phase("top_k") as item:
+            sources = list(input_files)
+            if merge_output and os.path.isfile(output) \
+                    and os.path.getsize(output) > 0:
+                sources.insert(0, IO(output, "r", type_data,
+                                     delimiter=delimiter, key_val=key))
+            item.add_input(sources)
+            top = top_k(chain(*sources), limit, sort_key, reverse)
+            for file in sources:
+                file.file.close()
+            out = IO(output, "w", header=header, delimiter=delimiter)
+            out.write_run(top)
+            out.file.close()
+            item.add_output([out])
+        return stats.finish()
+
+    if partitions > 1:
+        from external_two_way_sort.partition import partitioned_sort
+        target = output
+        if merge_output and os.path.isfile(output) \
+                and os.path.getsize(output) > 0:
+            input_files.insert(0, IO(output, "r", type_data,
+                                     delimiter=delimiter, key_val=key))
+            head, tail = os.path.split(output)
+            target = os.path.join(head, f"merged_{tail}")
+        params.pop("checkpoint")
+        params.pop("resume")
+        partitioned_sort(input_files, target, stats, partitions,
+                         partition_executor, temp_dir=temp_dir, **params)
+        for file in input_files:
+            file.file.close()
+        if target != output:
+            os.replace(target, output)
+        return stats.finish()
+
+    job_name = None
+    if checkpoint:
+        job_name = checkpoint_dir_name([file.filename for file in input_files],
+                                       output)
+    params["temp_dir"] = make_spill_dir(temp_dir, job_name)
+    done = False
+    try:
+        if file_workers == 1:
+            res_files = [external_sort(file, n, io_stats=io_stats, stats=stats,
+                                       **params)
+                         for n, file in enumerate(input_files)]
+        else:
+            res_files = list(input_files)
+            jobs = [n for n, file in enumerate(input_files)
+                    if not file.is_empty()]
+            with ProcessPoolExecutor(file_workers) as pool:
+                results = pool.map(external_sort_job,
+                                   [input_files[n].filename for n in jobs],
+                                   jobs,
+                                   [params] * len(jobs))
+                for n, (name, runs, job_stats) in zip(jobs, results):
+                    stats.add(job_stats)
+                    if name is not None:
+                        res_files[n] = IO(name, "r", type_data, is_temp=True,
+                                          header=header, key_val=key,
+                                          delimiter=delimiter,
+                                          compress_level=compress_level,
+                                          temp_dir=params["temp_dir"])
+                        res_files[n].set_runs(runs)
+                        res_files[n].is_temp = not checkpoint
+
+        if output is None:
+            for n, file in enumerate(res_files):
+                out = input_files[n]
+                if file is not out:
+                    with stats.phase("copy_back", n) as item:
+                        item.add_input([file])
+                        file.copy_to(out)
+                        out.file.close()
+                        item.rows, item.runs = file.records, 1
+                        item.bytes_written = out.size
+
+        elif merge_output and os.path.isfile(output) \
+                and os.path.getsize(output) > 0:
+            existing = IO(output, "r", type_data, delimiter=delimiter,
+                          key_val=key)
+            if not existing.is_empty():
+                res_files.insert(0, existing)
+            head, tail = os.path.split(output)
+            merged = os.path.join(head, f"merged_{tail}")
+            out = IO(merged, "w", header=header, delimiter=delimiter)
+            merge_to_one(res_files, out, reverse, io_queue_depth, io_stats,
+                         limit, unique, stats)
+            existing.file.close()
+            os.replace(merged, output)
 
-        def merge() -> Union[bool, IO]:
-            """
-            Функция слияния из двух лент, в другие две поочередно
-            :return: False, если сортировка не закончена,
-            файл, с отсортированным значениями в противном случае
-            """
-            if pass_num % 2 != 0:
-                tape1.change_mode("r")
-                tape2.change_mode("r")
-                tape3.change_mode("w")
-                tape4.change_mode("w")
-                read1, read2 = tape1, tape2
-                write1, write2 = tape3, tape4
-            else:
-                tape1.change_mode("w")
-                tape2.change_mode("w")
-                tape3.change_mode("r")
-                tape4.change_mode("r")
-                read1, read2 = tape3, tape4
-                write1, write2 = tape1, tape2
-
-            is_write1 = True
-            writes_count = 0
-            while True:
-
-                write_file = write1 if is_write1 else write2
-
-                seq1_len = 2 ** (pass_num - 1) * bsize
-                seq2_len = 2 ** (pass_num - 1) * bsize
-
-                i = j = 0
-
-                is_seq1_read, is_seq2_read = True, True
-                seq1_elem = seq2_elem = None
-
-                while i < seq1_len and j < seq2_len:
-
-                    if seq1_elem == EOF or seq2_elem == EOF:
-                        break
-
-                    if is_seq1_read:
-                        seq1_elem = read1.read()
-                    if seq1_elem == EOF:
-                        break
-
-                    if is_seq2_read:
-                        seq2_elem = read2.read()
-                    if seq2_elem == EOF:
-                        break
-
-                    if cmp(seq1_elem, seq2_elem):
-                        write_file.write(seq1_elem)
-                        i += 1
-                        is_seq1_read, is_seq2_read = True, False
-
-                    else:
-                        write_file.write(seq2_elem)
-                        j += 1
-                        is_seq1_read, is_seq2_read = False, True
-
-                fix_i, fix_j = i, j
-                for i in range(seq1_len - fix_i):
-                    if seq1_elem == EOF or seq1_elem is None:
-                        # print(seq1_elem, "241 EOF 1")
-                        break
-
-                    write_file.write(seq1_elem)
-                    if i != seq1_len - fix_i - 1:
-                        seq1_elem = read1.read()
-
-                for j in range(seq2_len - fix_j):
-                    if seq2_elem == EOF or seq2_elem is None:
-                        break
-                    write_file.write(seq2_elem)
-                    if j != seq2_len - fix_j - 1:
-                        seq2_elem = read2.read()
-
-                is_write1 = not is_write1
-                if seq1_elem == EOF or seq2_elem == EOF:
-                    break
+        else:
+            out = IO(output, "w", header=header, delimiter=delimiter)
+            merge_to_one(res_files, out, reverse, io_queue_depth, io_stats,
+                         limit, unique, stats)
 
-                writes_count += 1
-            if read1.is_empty() is not read2.is_empty():
-                if not read1.is_empty():
-                    return read1
-                return read2
-            return False
+        for file in res_files:
+            file.file.close()
+        done = True
+    finally:
+        if done or not checkpoint:
+            remove_spill_dir(params["temp_dir"], temp_dir == TEMP_DIR)
+    return stats.finish()
 
-        split()
 
-        while True:
-            result_file = merge()
-            if result_file:
-                break
-            pass_num += 1
-        return result_file
+def infer_data_type(sample: Iterable) -> str:
+    """
+    Определение типа значений по выборке: "i", если все значения целые
+    (в том числе не помещающиеся в 64 бита - на бинарных лентах они
+    записываются блобами), "f", если среди чисел есть дробные
+    (целые тогда приводятся к float), иначе "s"
+    :param sample: значения
+    :return: тип данных (i, f, s)
+    """
+    types = {type(val) for val in sample}
+    if types <= {int}:
+        return "i"
+    if types <= {int, float}:
+        return "f"
+    return "s"
 
-    res_files = []
-    for n, file in enumerate(input_files):
-        res_files.append(external_sort(file, n))
 
-    if output is None:
-        for n, file in enumerate(res_files):
-            out = input_files[n]
-            file.copy_to(out)
+def check_data_type(values: Iterable, type_data: str) -> Iterator:
+    """
+    Проверка, что значения соответствуют типу, определенному по первому
+    блоку: тип лент уже выбран, поэтому значение другого типа после
+    первого блока не может быть записано
+    :param values: значения
+    :param type_data: тип данных (i, f, s)
+    :return: генератор тех же значений
+    """
+    types = {"i": (int,), "f": (int, float), "s": (str,)}[type_data]
+    for val in values:
+        if not isinstance(val, types):
+            raise ValueError(f"value {val!r} does not match data type "
+                             f"{type_data!r} of the first values")
+        yield val
+
+
+def sort_iter(values: Iterable[Union[int, float, str, CsvRow]],
+              reverse: bool = False,
+              type_data: Optional[str] = None,
+              key: Optional[str] = None,
+              bsize: int = 1000,
+              merge_order: int = 2,
+              split_mode: str = "block",
+              spill_format: str = "binary",
+              workers: int = 1,
+              io_queue_depth: int = 0,
+              io_stats: Optional[IOStats] = None,
+              compress_level: int = 0,
+              temp_dir: Optional[str] = None) \
+        -> Iterator[Union[int, float, str, CsvRow]]:
+    """
+    Ленивая сортировка произвольного итерируемого объекта значений
+    или строк csv (словарей), который может не помещаться в память.
+    Если значений не больше bsize, они сортируются в памяти, иначе
+    серии сбрасываются на временные ленты и сливаются внешней сортировкой
+    :param values: сортируемые значения или словари
+    :param reverse: флаг сортировки по невозрастанию
+    :param type_data: тип значений (или столбца key), по умолчанию
+    определяется по первым bsize значениям (см. infer_data_type).
+    Значение другого типа после первого блока вызывает ValueError
+    :param key: ключ сортировки словарей (описание для SortKey.parse),
+    по умолчанию первый ключ. Значения ключа приводятся к своим типам
+    прямо в переданных словарях
+    :param bsize: размер буфера, для внутренней сортировки
+    :param merge_order: кол-во сливаемых за раз серий
+    :param split_mode: способ формирования начальных серий
+    :param spill_format: формат временных лент, только "binary": текстовые
+    ленты не сохраняют строки с переводом строки, строку "None"
+    и типы остальных полей словарей
+    :param workers: кол-во процессов, сортирующих начальные серии
+    :param io_queue_depth: глубина очередей фонового чтения и записи лент
+    :param io_stats: счетчики простоя в ожидании ввода-вывода
+    :param compress_level: уровень сжатия zlib временных лент
+    :param temp_dir: базовый каталог временных файлов, в нем создается
+    отдельный каталог лент этой сортировки
+    :return: генератор отсортированных значений
+    """
+    if spill_format != "binary":
+        raise ValueError(f"sort_iter supports only binary spill format, "
+                         f"got {spill_format!r}")
+    values = iter(values)
+    first = list(islice(values, bsize))
+    if not first:
+        return
 
+    header = None
+    sample = first
+    if isinstance(first[0], dict):
+        header = list(first[0])
+        key = key if key else header[0]
+        name = SortKey.parse(key).names[0]
+        sample = [row[name] for row in first]
+    if type_data is None:
+        type_data = infer_data_type(sample)
+    if header is None:
+        key = None
     else:
-        out = IO(output, "w", header=header, delimiter=delimiter)
-        merge_to_one(res_files, out, reverse)
-
-
-def merge_to_one(src: list[IO, ...], out: IO, reverse=False) -> None:
+        key = SortKey.parse(key, type_data)
+        first = list(map(key.convert, first))
+        values = map(key.convert, values)
+
+    if len(first) < bsize:
+        yield from sort_run(first, type_data, key, reverse)
+        return
+
+    temp_dir = temp_dir if temp_dir else TEMP_DIR
+    spill_dir = make_spill_dir(temp_dir)
+    try:
+        values = chain(first, values)
+        if header is None:
+            values = check_data_type(values, type_data)
+        runs = external_sort_runs(
+            values, "iter",
+            type_data=type_data, reverse=reverse, key=key, header=header,
+            bsize=bsize, merge_order=merge_order, split_mode=split_mode,
+            spill_format=spill_format, workers=workers,
+            io_queue_depth=io_queue_depth, io_stats=io_stats,
+            compress_level=compress_level, temp_dir=spill_dir,
+            final_runs=merge_order)
+        yield from heapq.merge(*runs, key=key, reverse=reverse)
+    finally:
+        remove_spill_dir(spill_dir, temp_dir == TEMP_DIR)
+
+
+def merge_to_one(src: list[IO, ...], out: IO, reverse=False,
+                 io_queue_depth: int = 0,
+                 io_stats: Optional[IOStats] = None,
+                 limit: Optional[int] = None,
+                 unique: Optional[str] = None,
+                 stats: Optional[SortStats] = None) -> None:
     """
-    Функция слияния всех файлов в один
+    Функция k-путевого слияния всех файлов в один на основе кучи,
+    каждое значение обходится за O(log k), где k - кол-во файлов
     :param src: исходные файлы
-    :param out: выходной файл
+    :param out: выходной файл, закрывается после записи
     :param reverse: флаг сортировки по невозразстанию
+    :param io_queue_depth: глубина очередей фонового чтения и записи,
+    0 - синхронный ввод-вывод
+    :param io_stats: счетчики простоя в ожидании ввода-вывода
+    :param limit: кол-во первых значений, после записи которых
+    слияние останавливается
+    :param unique: режим удаления дубликатов: None, "first" или "last"
+    :param stats: метрики, в которые добавляется фаза итогового слияния
     """
-    is_read_dict = {i: {"value": file.read(), "is_read": False}
-                    for i, file in enumerate(src)}
+    sort_key = None if src[0].is_txt else src[0].sort_key
 
-    def find_val():
+    def merged(files: list) -> Iterator:
         """
-        Функция поиска минимального или максимального значения
-        среди словаря элементов каждого файла
-        :return: подходящий эелмент
+        Слияние файлов с удалением дубликатов и остановкой после limit
+        :param files: файлы или итераторы по ним
+        :return: генератор значений для записи
         """
-        func = max if reverse else min
-        if src[0].is_txt:
-            return func(is_read_dict.items(),
-                        key=lambda x: x[1]["value"])
+        values = heapq.merge(*files, key=sort_key, reverse=reverse)
+        if unique is not None:
+            values = drop_duplicates(values, sort_key, unique)
+        return islice(values, limit)
+
+    stats = stats if stats is not None else SortStats(io_stats)
+    with stats.phase("final_merge") as item:
+        item.add_input(src)
+        if not io_queue_depth:
+            out.write_run(merged(src))
         else:
-            return func(is_read_dict.items(),
-                        key=lambda x: x[1]["value"][src[0].key])
-
-    def dict_upd():
-        """
-        Функция обновления словаря текущих значений
-        """
-        to_del = []
-        for k, v in is_read_dict.items():
-            if v["is_read"] is True:
-                v["value"] = src[k].read()
-                v["is_read"] = False
-
-            if v["value"] == EOF:
-                to_del.append(k)
-        for k in to_del:
-            del is_read_dict[k]
-
-    while is_read_dict:
-        need_val = find_val()
-        out.write(need_val[1]["value"])
-        is_read_dict[need_val[0]]["is_read"] = True
-        dict_upd()
+            readers = [ReadAhead(file, io_queue_depth, io_stats)
+                       for file in src]
+            writer = WriteBehind(out, io_queue_depth, io_stats)
+            writer.write_run(merged(readers))
+            for pipe in readers + [writer]:
+                pipe.close()
+        out.file.close()
+        item.add_output([out])
+        item.estimated_comparisons = \
+            item.rows * (len(src) - 1).bit_length()
 
 
 def main():
@@ -0,0 +1,248 @@
+import argparse
+from bisect import bisect
+from itertools import accumulate, count, islice
+import random
+import string
+from typing import Callable, Iterator, Optional
+
+from external_two_way_sort.compression import split_codec
+
+DISTRIBUTIONS = ("uniform", "sorted", "reversed", "nearly_sorted",
+                 "duplicates", "zipf")
+RANK_RANGE = 10 ** 9
+WRITE_BATCH = 1024
+SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+
+
+def parse_size(size: str) -> int:
+    """
+    Разбор размера данных вида "512KB", "10MB", "1GB" или числа байт
+    :param size: описание размера
+    :return: размер в байтах
+    """
+    size = size.strip().upper()
+    for unit in ("KB", "MB", "GB", "B"):
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(size)
+
+
+def _zipf_sampler(rnd: random.Random, cardinality: int,
+                  exponent: float) -> Callable[[], int]:
+    """
+    Выборка номеров значений по закону Ципфа: k-е по частоте
+    значение встречается с вероятностью, пропорциональной 1 / k^exponent.
+    В памяти хранятся только накопленные веса cardinality значений
+    :param rnd: генератор случайных чисел
+    :param cardinality: кол-во различных значений
+    :param exponent: показатель степени
+    :return: функция выборки номера значения
+    """
+    weights = list(accumulate(1 / (k ** exponent)
+                              for k in range(1, cardinality + 1)))
+    total = weights[-1]
+    return lambda: min(bisect(weights, rnd.random() * total), cardinality - 1)
+
+
+def generate_ranks(rnd: random.Random, distribution: str = "uniform",
+                   rows: int = 200, noise: float = 0.01,
+                   cardinality: int = 16,
+                   zipf_exponent: float = 1.1) -> Iterator[int]:
+    """
+    Бесконечный генератор рангов значений из [0, RANK_RANGE)
+    с заданным распределением, ранги затем переводятся в значения
+    нужного типа с сохранением порядка
+    :param rnd: генератор случайных чисел
+    :param distribution: распределение (одно из DISTRIBUTIONS)
+    :param rows: ожидаемое кол-во значений, по нему подбирается шаг
+    упорядоченных распределений
+    :param noise: доля случайных значений в nearly_sorted
+    :param cardinality: кол-во различных значений в duplicates и zipf
+    :param zipf_exponent: показатель степени распределения Ципфа
+    :return: генератор рангов
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution: {distribution}")
+    step = RANK_RANGE / max(rows, 1)
+    last = RANK_RANGE - 1
+    if distribution == "uniform":
+        while True:
+            yield rnd.randrange(RANK_RANGE)
+    elif distribution in ("sorted", "nearly_sorted"):
+        for i in count():
+            rank = min(int(i * step), last)
+            if distribution == "nearly_sorted" and rnd.random() < noise:
+                rank = rnd.randrange(RANK_RANGE)
+            yield rank
+    elif distribution == "reversed":
+        for i in count():
+            yield max(last - int(i * step), 0)
+    else:
+        width = RANK_RANGE // cardinality
+        if distribution == "duplicates":
+            while True:
+                yield rnd.randrange(cardinality) * width
+        sample = _zipf_sampler(rnd, cardinality, zipf_exponent)
+        while True:
+            yield sample() * width
+
+
+def rank_formatter(data_type: str, str_len: int = 8) -> Callable[[int], str]:
+    """
+    Перевод ранга в строку значения нужного типа, порядок рангов
+    сохраняется (строки одинаковой длины сравниваются посимвольно)
+    :param data_type: тип значений (i, f, s)
+    :param str_len: длина строк
+    :return: функция форматирования ранга
+    """
+    if data_type == "i":
+        return lambda rank: str(rank - RANK_RANGE // 2)
+    if data_type == "f":
+        return lambda rank: repr((rank - RANK_RANGE // 2) / 1000)
+    if data_type != "s":
+        raise ValueError(f"unknown data type: {data_type}")
+    if str_len < 1:
+        raise ValueError("str_len must be positive")
+    letters = string.ascii_lowercase
+    scale = len(letters) ** str_len
+
+    def to_str(rank: int) -> str:
+        num = rank * scale // RANK_RANGE
+        chars = []
+        for _ in range(str_len):
+            num, digit = divmod(num, len(letters))
+            chars.append(letters[digit])
+        return "".join(reversed(chars))
+
+    return to_str
+
+
+def generate_lines(data_type: str = "i", distribution: str = "uniform",
+                   rows: int = 200, columns: int = 0, str_len: int = 8,
+                   delimiter: str = ",", seed: Optional[int] = None,
+                   **params) -> Iterator[str]:
+    """
+    Бесконечный генератор строк txt или csv файла. В csv первый столбец
+    имеет заданное распределение, остальные - равномерное
+    :param data_type: тип значений (i, f, s)
+    :param distribution: распределение (одно из DISTRIBUTIONS)
+    :param rows: ожидаемое кол-во строк
+    :param columns: кол-во столбцов csv, 0 - txt файл
+    :param str_len: длина строк при data_type="s"
+    :param delimiter: разделитель столбцов csv
+    :param seed: зерно генератора, одинаковое зерно дает одинаковые строки
+    :param params: параметры generate_ranks (noise, cardinality,
+    zipf_exponent)
+    :return: генератор строк без перевода строки
+    """
+    rnd = random.Random(seed)
+    fmt = rank_formatter(data_type, str_len)
+    ranks = generate_ranks(rnd, distribution, rows, **params)
+    if not columns:
+        return map(fmt, ranks)
+    others = [generate_ranks(rnd, "uniform") for _ in range(columns - 1)]
+    return (delimiter.join(map(fmt, (rank, *map(next, others))))
+            for rank in ranks)
+
+
+def csv_header(columns: int) -> list[str, ...]:
+    """
+    Заголовок csv файла: столбцы a, b, c, ..., z, c26, c27, ...
+    :param columns: кол-во столбцов
+    :return: имена столбцов
+    """
+    letters = string.ascii_lowercase
+    return [letters[i] if i < len(letters) else f"c{i}"
+            for i in range(columns)]
+
+
+def write_workload(file_name: str, rows: Optional[int] = None,
+                   size: Optional[int] = None, data_type: str = "i",
+                   distribution: str = "uniform", columns: int = 4,
+                   str_len: int = 8, delimiter: str = ",",
+                   seed: Optional[int] = None, **params) -> int:
+    """
+    Потоковая запись входного txt или csv файла (в том числе сжатого,
+    .gz, .bz2, .xz) из rows строк или размера не меньше size байт.
+    В памяти держится не больше WRITE_BATCH строк
+    :param file_name: имя файла, формат определяется расширением
+    :param rows: кол-во строк
+    :param size: размер файла в байтах (до сжатия), если rows не задан
+    :param data_type: тип значений (i, f, s)
+    :param distribution: распределение (одно из DISTRIBUTIONS)
+    :param columns: кол-во столбцов csv
+    :param str_len: длина строк при data_type="s"
+    :param delimiter: разделитель столбцов csv
+    :param seed: зерно генератора
+    :param params: параметры generate_ranks (noise, cardinality,
+    zipf_exponent)
+    :return: кол-во записанных строк
+    """
+    if (rows is None) == (size is None):
+        raise ValueError("exactly one of rows and size must be given")
+    name, codec = split_codec(file_name)
+    is_csv = not name.endswith(".txt")
+    if rows is None:
+        sample = rank_formatter(data_type, str_len)(RANK_RANGE // 2)
+        line_len = (len(sample) + 1) * (columns if is_csv else 1)
+        expected = max(size // line_len, 1)
+    else:
+        expected = rows
+    lines = generate_lines(data_type, distribution, expected,
+                           columns if is_csv else 0, str_len, delimiter,
+                           seed, **params)
+
+    opener = codec.open if codec is not None else open
+    written = done = 0
+    with opener(file_name, "wt", newline="", encoding="utf-8") as file:
+        if is_csv:
+            written += file.write(delimiter.join(csv_header(columns)) + "\n")
+        while (written < size) if rows is None else (done < rows):
+            batch = WRITE_BATCH if rows is None \
+                else min(WRITE_BATCH, rows - done)
+            written += file.write("".join(
+                line + "\n" for line in islice(lines, batch)))
+            done += batch
+    return done
+
+
+def main():
+    """
+    Точка входа CLI генератора
+    """
+    parser = argparse.ArgumentParser(description="Генерация входных файлов "
+                                                 "для внешней сортировки")
+    parser.add_argument("file_name",
+                        help="Имя файла (.txt или .csv, можно сжатого)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--rows", "-n", type=int, help="Кол-во строк")
+    group.add_argument("--size", "-s", type=str,
+                       help="Размер файла, например 512MB или 2GB")
+    parser.add_argument("--type_data", "-td", default="i",
+                        choices=["i", "f", "s"], help="Тип значений")
+    parser.add_argument("--distribution", "-dist", default="uniform",
+                        choices=DISTRIBUTIONS, help="Распределение значений")
+    parser.add_argument("--columns", "-c", type=int, default=4,
+                        help="Кол-во столбцов csv")
+    parser.add_argument("--str_len", type=int, default=8,
+                        help="Длина строк")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Зерно генератора")
+    parser.add_argument("--noise", type=float, default=0.01,
+                        help="Доля случайных значений в nearly_sorted")
+    parser.add_argument("--cardinality", type=int, default=16,
+                        help="Кол-во различных значений в duplicates и zipf")
+    parser.add_argument("--zipf_exponent", type=float, default=1.1,
+                        help="Показатель степени распределения Ципфа")
+    args = parser.parse_args()
+
+    write_workload(args.file_name, args.rows,
+                   parse_size(args.size) if args.size else None,
+                   args.type_data, args.distribution, args.columns,
+                   args.str_len, seed=args.seed, noise=args.noise,
+                   cardinality=args.cardinality,
+                   zipf_exponent=args.zipf_exponent)
+
+
+if __name__ == '__main__':
+    main()
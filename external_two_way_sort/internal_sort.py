@@ -1,67 +1,287 @@
-from sys import getrecursionlimit
+from array import array
+import heapq
+from itertools import groupby
+from operator import gt, lt
 
-from typing import Optional, Callable
+from typing import Optional, Callable, Iterable, Iterator, Any, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_END = object()
+NUMERIC_TYPES = {"i": ("q", "int64"), "f": ("d", "float64")}
+
+
+def natural_runs(keys: list, before: Callable,
+                 values: Optional[list] = None) -> list[int, ...]:
+    """
+    Поиск естественных серий: неубывающие (в порядке before) серии
+    остаются как есть, строго убывающие разворачиваются на месте
+
+    @param keys: ключи сортируемого массива
+    @param before: строгое сравнение "должен стоять раньше"
+    @param values: значения, соответствующие ключам, разворачиваются вместе
+    с ними
+    @return: границы серий, начиная с 0 и заканчивая len(keys)
+    """
+    n_len = len(keys)
+    bounds = [0]
+    i = 1
+    while i < n_len:
+        start = i - 1
+        if before(keys[i], keys[start]):
+            while i < n_len and before(keys[i], keys[i - 1]):
+                i += 1
+            keys[start:i] = keys[start:i][::-1]
+            if values is not None:
+                values[start:i] = values[start:i][::-1]
+        else:
+            while i < n_len and not before(keys[i], keys[i - 1]):
+                i += 1
+        bounds.append(i)
+        i += 1
+    if bounds[-1] != n_len:
+        bounds.append(n_len)
+    return bounds
 
 
 def merge_sort(array: list, reverse: bool = False,
-               cmp: Optional[Callable] = None) -> list:
+               key: Optional[Callable] = None) -> list:
     """
-    Реализация сортировки слиянием
+    Устойчивая восходящая сортировка слиянием естественных серий.
+    Работает без рекурсии: серии поочередно сливаются из массива
+    во вспомогательный буфер и обратно.
+    Ключ вычисляется один раз для каждого элемента
 
     @param array: сортируемый массив
     @param reverse: сортируем напрямую или в обратную сторону
     @param key: ключ сортировки в виде функции
-    @param cmp: компаратор для значений
     @return: отсортированный массив
     """
-    cmp = cmp if cmp is not None else lambda x, y: x < y
-
-    def insertion_sort(arr):
-        for i in range(1, len(arr)):
-            temp = arr[i]
-            j = i - 1
-            while j >= 0 and \
-                    cmp(temp, arr[j]):
-                arr[j + 1] = arr[j]
-                j -= 1
-            arr[j + 1] = temp
-
-    def merge_sort(arr: list, depth: int = 1) -> list:
-
-        if (n_len := len(arr)) > 1:
-            mid = n_len // 2
-            left = arr[:mid]
-            right = arr[mid:]
-            if depth + 1 > getrecursionlimit():
-                insertion_sort(left)
-                insertion_sort(right)
-            else:
-                merge_sort(left, depth + 1)
-                merge_sort(right, depth + 1)
-
-            i = j = k = 0
-
-            while i < len(left) and j < len(right):
-                if cmp(left[i], right[j]):
-                    arr[k] = left[i]
-                    i += 1
+    n_len = len(array)
+    if n_len < 2:
+        return array
+    before = gt if reverse else lt
+    with_values = key is not None
+
+    keys = [key(val) for val in array] if with_values else array
+    bounds = natural_runs(keys, before, array if with_values else None)
+
+    src_keys, dst_keys = keys, [None] * n_len
+    src_vals, dst_vals = array, [None] * n_len if with_values else None
+
+    while len(bounds) > 2:
+        new_bounds = [0]
+        for j in range(0, len(bounds) - 1, 2):
+            lo, mid = bounds[j], bounds[j + 1]
+            hi = bounds[j + 2] if j + 2 < len(bounds) else mid
+            i, m, k = lo, mid, lo
+            while i < mid and m < hi:
+                if before(src_keys[m], src_keys[i]):
+                    dst_keys[k] = src_keys[m]
+                    if with_values:
+                        dst_vals[k] = src_vals[m]
+                    m += 1
                 else:
-                    arr[k] = right[j]
-                    j += 1
+                    dst_keys[k] = src_keys[i]
+                    if with_values:
+                        dst_vals[k] = src_vals[i]
+                    i += 1
                 k += 1
+            dst_keys[k:k + mid - i] = src_keys[i:mid]
+            dst_keys[k + mid - i:hi] = src_keys[m:hi]
+            if with_values:
+                dst_vals[k:k + mid - i] = src_vals[i:mid]
+                dst_vals[k + mid - i:hi] = src_vals[m:hi]
+            new_bounds.append(hi)
+        bounds = new_bounds
+        src_keys, dst_keys = dst_keys, src_keys
+        src_vals, dst_vals = dst_vals, src_vals
 
-            while j < len(right):
-                arr[k] = right[j]
-                j += 1
-                k += 1
+    result = src_vals if with_values else src_keys
+    if result is not array:
+        array[:] = result
+    return array
 
-            while i < len(left):
-                arr[k] = left[i]
-                i += 1
-                k += 1
-        return arr
 
-    return merge_sort(array)
+def numeric_sort(values: list, data_type: str,
+                 reverse: bool = False) -> Union[array, list]:
+    """
+    Сортировка чисел в непрерывном типизированном буфере:
+    через numpy, если он установлен, иначе встроенной сортировкой.
+    Если числа не помещаются в 64 бита, сортируется обычный список
+
+    @param values: сортируемые числа
+    @param data_type: тип чисел ("i" или "f")
+    @param reverse: сортируем напрямую или в обратную сторону
+    @return: отсортированный массив array
+    """
+    typecode, dtype = NUMERIC_TYPES[data_type]
+    try:
+        if numpy is None:
+            return array(typecode, sorted(values, reverse=reverse))
+        buf = numpy.array(values, dtype=dtype)
+    except OverflowError:
+        return sorted(values, reverse=reverse)
+
+    buf.sort(kind="stable")
+    if reverse:
+        buf = buf[::-1]
+    res = array(typecode)
+    res.frombytes(buf.tobytes())
+    return res
+
+
+def sort_run(run: list, data_type: str, key: Optional[Callable] = None,
+             reverse: bool = False) -> Union[array, list]:
+    """
+    Сортировка одной серии значений или строк csv по ключу key.
+    Функция объявлена на уровне модуля, чтобы её можно было
+    выполнять в дочерних процессах
+
+    @param run: сортируемая серия
+    @param data_type: тип значений
+    @param key: ключ сортировки строк csv в виде функции
+    @param reverse: сортируем напрямую или в обратную сторону
+    @return: отсортированная серия
+    """
+    if key is None and data_type in NUMERIC_TYPES:
+        return numeric_sort(run, data_type, reverse)
+    return merge_sort(run, reverse, key)
+
+
+class ReversedKey:
+    """
+    Обертка над ключом, инвертирующая порядок сравнения,
+    нужна для куч при сортировке по невозрастанию
+    """
+    __slots__ = ("val",)
+
+    def __init__(self, val):
+        self.val = val
+
+    def __lt__(self, other: "ReversedKey") -> bool:
+        return other.val < self.val
+
+    def __eq__(self, other: "ReversedKey") -> bool:
+        return self.val == other.val
+
+
+def replacement_selection(values: Iterable, size: int,
+                          key: Optional[Callable] = None,
+                          reverse: bool = False) -> Iterator[tuple[int, Any]]:
+    """
+    Формирование серий методом выбора с замещением.
+    В памяти хранится не более size значений, на случайных данных
+    серии получаются в среднем вдвое длиннее size,
+    на почти отсортированных - одна длинная серия
+
+    @param values: исходные значения
+    @param size: размер кучи
+    @param key: ключ сортировки в виде функции
+    @param reverse: сортируем напрямую или в обратную сторону
+    @return: генератор пар (номер серии, значение)
+    """
+    if size < 1:
+        raise ValueError("size must be positive")
+    key = key if key is not None else lambda x: x
+    wrap = ReversedKey if reverse else lambda x: x
+
+    values = iter(values)
+    heap = [(0, wrap(key(val)), num, val)
+            for num, val in zip(range(size), values)]
+    heapq.heapify(heap)
+    counter = len(heap)
+
+    while heap:
+        run_num, last_key, _, val = heap[0]
+        yield run_num, val
+
+        new_val = next(values, _END)
+        if new_val is _END:
+            heapq.heappop(heap)
+            continue
+
+        new_key = wrap(key(new_val))
+        new_run = run_num + 1 if new_key < last_key else run_num
+        heapq.heapreplace(heap, (new_run, new_key, counter, new_val))
+        counter += 1
+
+
+def natural_run_ids(values: Iterable, key: Optional[Callable] = None,
+                    reverse: bool = False) -> Iterator[tuple[int, Any]]:
+    """
+    Разметка потока значений на естественные серии:
+    новая серия начинается там, где порядок нарушается
+
+    @param values: исходные значения
+    @param key: ключ сортировки в виде функции
+    @param reverse: сортируем напрямую или в обратную сторону
+    @return: генератор пар (номер серии, значение)
+    """
+    before = gt if reverse else lt
+    run_num = 0
+    prev = _END
+    for val in values:
+        cur = key(val) if key is not None else val
+        if prev is not _END and before(cur, prev):
+            run_num += 1
+        prev = cur
+        yield run_num, val
+
+
+def is_sorted(values: Iterable, key: Optional[Callable] = None,
+              reverse: bool = False) -> bool:
+    """
+    Проверка, что значения уже упорядочены,
+    останавливается на первом нарушении порядка
+
+    @param values: исходные значения
+    @param key: ключ сортировки в виде функции
+    @param reverse: сортируем напрямую или в обратную сторону
+    @return: True, если значения образуют одну серию
+    """
+    return all(run_num == 0
+               for run_num, _ in natural_run_ids(values, key, reverse))
+
+
+def drop_duplicates(values: Iterable, key: Optional[Callable] = None,
+                    keep: str = "first") -> Iterator:
+    """
+    Удаление дубликатов из отсортированной последовательности:
+    из каждой группы значений с равным ключом остается одно
+
+    @param values: отсортированные значения
+    @param key: ключ сортировки в виде функции
+    @param keep: какое из равных значений оставить: "first" или "last"
+    @return: генератор значений без дубликатов
+    """
+    for _, group in groupby(values, key):
+        if keep == "first":
+            yield next(group)
+        else:
+            for val in group:
+                pass
+            yield val
+
+
+def top_k(values: Iterable, limit: int, key: Optional[Callable] = None,
+          reverse: bool = False) -> list:
+    """
+    Отбор limit первых в порядке сортировки значений за один проход
+    через кучу размера limit, порядок равных значений сохраняется
+
+    @param values: исходные значения
+    @param limit: кол-во отбираемых значений
+    @param key: ключ сортировки в виде функции
+    @param reverse: отбираем наибольшие значения вместо наименьших
+    @return: отсортированный список не более чем из limit значений
+    """
+    if reverse:
+        return heapq.nlargest(limit, values, key=key)
+    return heapq.nsmallest(limit, values, key=key)
 
 
 if __name__ == '__main__':
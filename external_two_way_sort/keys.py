@@ -0,0 +1,107 @@
+from operator import itemgetter
+from typing import Union
+
+from external_two_way_sort.internal_sort import ReversedKey
+
+TYPES = {"i": int, "s": str, "f": float}
+ORDERS = ("asc", "desc")
+
+
+class KeyColumn:
+    """
+    Столбец составного ключа сортировки
+    """
+    __slots__ = ("name", "data_type", "descending")
+
+    def __init__(self, name: str, data_type: str = "s",
+                 descending: bool = False):
+        """
+        Инициализация столбца ключа
+        :param name: имя столбца
+        :param data_type: тип значений столбца (i, s, f)
+        :param descending: флаг сортировки столбца по невозрастанию
+        """
+        if data_type not in TYPES:
+            raise ValueError(f"unknown data type: {data_type}")
+        self.name = name
+        self.data_type = data_type
+        self.descending = descending
+
+    def __repr__(self) -> str:
+        order = "desc" if self.descending else "asc"
+        return f"{self.name}:{self.data_type}:{order}"
+
+
+class SortKey:
+    """
+    Составной ключ сортировки строк csv. Значения столбцов ключа
+    приводятся к своим типам один раз при чтении строки (convert),
+    после чего ключ строки - кортеж уже типизированных значений
+    """
+    def __init__(self, columns: list[KeyColumn, ...]):
+        """
+        Инициализация ключа
+        :param columns: столбцы ключа в порядке приоритета
+        """
+        if not columns:
+            raise ValueError("sort key must have at least one column")
+        self.columns = columns
+        self.names = [column.name for column in columns]
+        self._types = [TYPES[column.data_type] for column in columns]
+        self._getter = itemgetter(*self.names)
+        self._plain = not any(column.descending for column in columns)
+
+    @classmethod
+    def parse(cls, spec: Union[str, "SortKey"],
+              data_type: str = "s") -> "SortKey":
+        """
+        Разбор описания ключа вида "name[:type][:order],...",
+        например "b:i:desc,a". Тип по умолчанию - data_type,
+        порядок по умолчанию - asc
+        :param spec: описание ключа (или уже готовый ключ)
+        :param data_type: тип столбцов без явно указанного типа
+        :return: ключ сортировки
+        """
+        if isinstance(spec, SortKey):
+            return spec
+        columns = []
+        for item in spec.split(","):
+            name, *options = item.strip().split(":")
+            column_type, descending = data_type, False
+            for option in options:
+                if option in ORDERS:
+                    descending = option == "desc"
+                elif option in TYPES:
+                    column_type = option
+                else:
+                    raise ValueError(f"bad sort key option: {option}")
+            columns.append(KeyColumn(name, column_type, descending))
+        return cls(columns)
+
+    def convert(self, row: dict) -> dict:
+        """
+        Приведение значений столбцов ключа строки к их типам
+        :param row: строка csv
+        :return: та же строка
+        """
+        for name, descr in zip(self.names, self._types):
+            row[name] = descr(row[name])
+        return row
+
+    def __call__(self, row: dict):
+        """
+        Вычисление ключа строки, столбцы по невозрастанию
+        инвертируются
+        :param row: строка с уже приведенными значениями
+        :return: значение или кортеж значений для сравнения
+        """
+        if self._plain:
+            return self._getter(row)
+        return tuple(
+            row[column.name] if not column.descending
+            else ReversedKey(row[column.name]) if column.data_type == "s"
+            else -row[column.name]
+            for column in self.columns)
+
+    def __repr__(self) -> str:
+        return ",".join(map(repr, self.columns))
@@ -0,0 +1,224 @@
+from contextlib import contextmanager
+import json
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional
+
+from external_two_way_sort.async_io import IOStats
+
+PHASES = ("top_k", "split", "merge", "final_merge", "copy_back", "sample",
+          "partition", "concat")
+
+
+class PhaseStats:
+    """
+    Метрики одной фазы сортировки: формирования серий, прохода слияния,
+    итогового слияния, копирования результата обратно во входной файл
+    или одной из фаз сортировки с разбиением на диапазоны
+    """
+    __slots__ = ("phase", "file_num", "pass_num", "rows", "runs",
+                 "bytes_read", "bytes_written", "estimated_comparisons",
+                 "time")
+
+    def __init__(self, phase: str, file_num: Optional[str] = None,
+                 pass_num: int = 0):
+        """
+        Инициализация метрик фазы
+        :param phase: название фазы (одно из PHASES)
+        :param file_num: номер входного файла, None - все файлы
+        :param pass_num: номер прохода слияния
+        """
+        if phase not in PHASES:
+            raise ValueError(f"unknown phase: {phase}")
+        self.phase = phase
+        self.file_num = file_num
+        self.pass_num = pass_num
+        self.rows = 0
+        self.runs = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.estimated_comparisons = 0
+        self.time = 0.0
+
+    def add_input(self, files: Iterable) -> None:
+        """
+        Учет прочитанных за фазу файлов
+        :param files: файлы (IO)
+        """
+        self.bytes_read += sum(file.size for file in files)
+
+    def add_output(self, files: Iterable) -> None:
+        """
+        Учет записанных за фазу файлов: значений, серий и байт
+        :param files: файлы (IO)
+        """
+        for file in files:
+            self.rows += file.records
+            self.runs += len(file.runs)
+            self.bytes_written += file.size
+
+    def as_dict(self) -> dict:
+        """
+        Метрики фазы в виде словаря
+        :return: словарь метрик
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"PhaseStats({self.phase}, file: {self.file_num}, "
+                f"pass: {self.pass_num}, rows: {self.rows}, "
+                f"runs: {self.runs}, read: {self.bytes_read} bytes, "
+                f"written: {self.bytes_written} bytes, "
+                f"estimated comparisons: {self.estimated_comparisons}, "
+                f"time: {self.time:.4f} sec)")
+
+
+def estimate_split_comparisons(runs: Iterable[int], split_mode: str,
+                               bsize: int) -> int:
+    """
+    Оценка кол-ва сравнений при формировании серий: n*log2(n) на серию
+    при сортировке блоков, log2(bsize) на значение при выборе
+    с замещением и одно сравнение на значение для естественных серий
+    :param runs: длины записанных серий
+    :param split_mode: способ формирования серий
+    :param bsize: размер буфера
+    :return: оценка кол-ва сравнений
+    """
+    if split_mode == "block":
+        return sum(run * (run - 1).bit_length() for run in runs)
+    rows = sum(runs)
+    if split_mode == "replacement":
+        return rows * bsize.bit_length()
+    return rows
+
+
+def estimate_merge_comparisons(files: list) -> int:
+    """
+    Оценка кол-ва сравнений при слиянии серий файлов с одинаковыми
+    номерами: log2(k) на значение, где k - кол-во сливаемых серий
+    :param files: читаемые файлы (IO) с известными длинами серий
+    :return: оценка кол-ва сравнений
+    """
+    total = 0
+    for run_num in range(max((len(file.runs) for file in files), default=0)):
+        lengths = [file.runs[run_num] for file in files
+                   if run_num < len(file.runs)]
+        total += sum(lengths) * (len(lengths) - 1).bit_length()
+    return total
+
+
+class SortStats:
+    """
+    Метрики сортировки по фазам, счетчики ввода-вывода и обработчики,
+    вызываемые по завершении каждой фазы. Кол-во сравнений в фазах -
+    оценка по кол-ву значений и серий, а не подсчет фактических сравнений
+    """
+    def __init__(self, io_stats: Optional[IOStats] = None,
+                 hooks: Iterable[Callable[[PhaseStats], None]] = ()):
+        """
+        Инициализация метрик
+        :param io_stats: счетчики ввода-вывода
+        :param hooks: функции, получающие метрики каждой завершенной фазы
+        """
+        self.io = io_stats if io_stats is not None else IOStats()
+        self.phases = []
+        self.hooks = list(hooks)
+        self.started = perf_counter()
+        self.wall_time = 0.0
+
+    def __getstate__(self) -> dict:
+        return {"io": self.io, "phases": self.phases, "hooks": [],
+                "started": self.started, "wall_time": self.wall_time}
+
+    def finish(self) -> "SortStats":
+        """
+        Фиксация времени всей сортировки от создания метрик. В отличие
+        от суммы времени фаз, не учитывает фазы, выполнявшиеся
+        одновременно в разных процессах, дважды
+        :return: те же метрики
+        """
+        self.wall_time = perf_counter() - self.started
+        return self
+
+    @contextmanager
+    def phase(self, name: str, file_num=None,
+              pass_num: int = 0) -> Iterator[PhaseStats]:
+        """
+        Замер фазы: время фазы засекается, а её метрики
+        после завершения передаются в record
+        :param name: название фазы
+        :param file_num: номер входного файла
+        :param pass_num: номер прохода слияния
+        :return: метрики фазы, заполняемые вызывающим кодом
+        """
+        item = PhaseStats(name, None if file_num is None else str(file_num),
+                          pass_num)
+        start = perf_counter()
+        yield item
+        item.time = perf_counter() - start
+        self.record(item)
+
+    def record(self, item: PhaseStats) -> None:
+        """
+        Сохранение метрик завершенной фазы и вызов обработчиков
+        :param item: метрики фазы
+        """
+        self.phases.append(item)
+        for hook in self.hooks:
+            hook(item)
+
+    def add(self, other: "SortStats") -> None:
+        """
+        Прибавление метрик другого экземпляра, например,
+        полученного из дочернего процесса. Время всей сортировки
+        не прибавляется: дочерние сортировки идут внутри неё
+        :param other: прибавляемые метрики
+        """
+        self.io.add(other.io)
+        for item in other.phases:
+            self.record(item)
+
+    @property
+    def passes(self) -> int:
+        """
+        Кол-во выполненных проходов слияния по всем входным файлам
+        """
+        return sum(item.phase == "merge" for item in self.phases)
+
+    def totals(self) -> dict:
+        """
+        Итоговые метрики по всем фазам: wall_time - время всей
+        сортировки, phase_time - сумма времени фаз, которая при
+        file_workers, workers или partitions больше 1 может его превышать
+        :return: словарь итоговых метрик
+        """
+        return {
+            "wall_time": self.wall_time,
+            "phase_time": sum(item.time for item in self.phases),
+            "bytes_read": sum(item.bytes_read for item in self.phases),
+            "bytes_written": sum(item.bytes_written for item in self.phases),
+            "estimated_comparisons": sum(item.estimated_comparisons
+                                         for item in self.phases),
+            "passes": self.passes,
+            "initial_runs": sum(item.runs for item in self.phases
+                                if item.phase == "split"),
+        }
+
+    def as_dict(self) -> dict:
+        """
+        Все метрики в виде, пригодном для сериализации в json
+        :return: словарь метрик
+        """
+        return {"totals": self.totals(),
+                "phases": [item.as_dict() for item in self.phases],
+                "io": self.io.as_dict()}
+
+    def dump(self, path: str) -> None:
+        """
+        Запись метрик в json файл
+        :param path: путь к файлу
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    def __repr__(self) -> str:
+        return f"SortStats({self.totals()})"
@@ -0,0 +1,288 @@
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from itertools import chain, islice
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+from typing import Any, Iterable, Optional
+
+from external_two_way_sort.compression import split_codec
+from external_two_way_sort.external_sort import IO, PARTITION_EXECUTORS, \
+    TEMP_DIR, make_spill_dir, my_sort, remove_spill_dir
+from external_two_way_sort.keys import SortKey
+from external_two_way_sort.metrics import SortStats
+
+SAMPLE_PER_PARTITION = 128
+PREFIX_SAMPLE_FACTOR = 8
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_offsets(file: IO, size: int, rnd: random.Random) -> list:
+    """
+    Выборка значений несжатого txt или csv файла без чтения всего файла:
+    для каждого из size случайных смещений берется первая полная строка
+    после него. Строки, которые не удалось разобрать (например, попавшие
+    внутрь многострочного поля csv), пропускаются
+    :param file: исходный файл
+    :param size: размер выборки
+    :param rnd: генератор случайных чисел
+    :return: выборка значений (строк csv с приведенными столбцами ключа)
+    """
+    total = os.path.getsize(file.path)
+    sample = []
+    if not total:
+        return sample
+    with open(file.path, "rb") as raw:
+        for offset in sorted(rnd.randrange(total) for _ in range(size)):
+            raw.seek(offset)
+            raw.readline()
+            try:
+                line = raw.readline().decode().rstrip("\r\n")
+                if not line:
+                    continue
+                if file.is_txt:
+                    sample.append(file.descr(line))
+                    continue
+                row = next(csv.reader([line], delimiter=file.delimiter))
+                if len(row) == len(file.header):
+                    sample.append(file.sort_key.convert(
+                        dict(zip(file.header, row))))
+            except ValueError:
+                continue
+    return sample
+
+
+def choose_splitters(keys: list, partitions: int) -> list:
+    """
+    Выбор разделителей диапазонов по квантилям выборки ключей.
+    Равные разделители объединяются, поэтому при большом кол-ве
+    дубликатов диапазонов может получиться меньше partitions
+    :param keys: выборка ключей
+    :param partitions: кол-во диапазонов
+    :return: возрастающие разделители, не больше partitions - 1
+    """
+    keys = sorted(keys)
+    splitters = []
+    for num in range(1, partitions):
+        key = keys[num * len(keys) // partitions] if keys else None
+        if key is not None and (not splitters or splitters[-1] < key):
+            splitters.append(key)
+    return splitters
+
+
+def sort_partition(src: str, output: str, params: dict) -> SortStats:
+    """
+    Сортировка одного диапазона, выполняется в отдельном процессе
+    :param src: файл диапазона
+    :param output: выходной файл диапазона
+    :param params: параметры my_sort
+    :return: метрики сортировки
+    """
+    return my_sort(src, output, **params)
+
+
+def run_subprocess_jobs(jobs: list[tuple[str, str, dict], ...],
+                        spill_dir: str,
+                        workers: int = 1) -> list[SortStats, ...]:
+    """
+    Сортировка диапазонов отдельными процессами интерпретатора
+    (python -m external_two_way_sort.partition job.json). Задание
+    передается json файлом, поэтому процессы не разделяют память
+    и могут быть перенесены на другие узлы с общей файловой системой
+    :param jobs: задания (файл диапазона, выходной файл, параметры)
+    :param spill_dir: каталог заданий и метрик
+    :param workers: кол-во одновременно работающих процессов
+    :return: метрики сортировки диапазонов
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+    running, stats_paths = deque(), []
+
+    def wait_oldest() -> None:
+        """
+        Ожидание самого раннего из запущенных процессов,
+        при ошибке остальные процессы останавливаются
+        """
+        num, proc = running.popleft()
+        if proc.wait():
+            for _, other in running:
+                other.kill()
+                other.wait()
+            raise RuntimeError(f"partition {num} sort failed "
+                               f"with exit code {proc.returncode}")
+
+    for num, (src, output, params) in enumerate(jobs):
+        if len(running) >= workers:
+            wait_oldest()
+        job_path = os.path.join(spill_dir, f"job_{num}.json")
+        stats_paths.append(job_path + ".stats")
+        with open(job_path, "w", encoding="utf-8") as file:
+            json.dump({"src": src, "output": output, "params": params,
+                       "stats": stats_paths[-1]}, file)
+        running.append((num, subprocess.Popen(
+            [sys.executable, "-m", "external_two_way_sort.partition",
+             job_path], env=env)))
+    while running:
+        wait_oldest()
+    results = []
+    for path in stats_paths:
+        with open(path, "rb") as file:
+            results.append(pickle.load(file))
+    return results
+
+
+def partitioned_sort(input_files: list[IO, ...], output: str,
+                     stats: SortStats, partitions: int,
+                     executor: str = "process",
+                     type_data: str = "s",
+                     reverse: bool = False,
+                     key: Optional[SortKey] = None,
+                     header: Optional[list[str, ...]] = None,
+                     delimiter: str = ",",
+                     limit: Optional[int] = None,
+                     temp_dir: str = TEMP_DIR,
+                     seed: int = 0,
+                     **params: Any) -> None:
+    """
+    Сортировка с разбиением на диапазоны ключей (sample sort):
+    по выборке ключей выбираются разделители, за один потоковый проход
+    значения раскладываются по partitions файлам диапазонов, каждый
+    диапазон сортируется в отдельном процессе, а так как диапазоны
+    не пересекаются, результаты просто записываются друг за другом.
+    Несжатые файлы читаются для выборки только по случайным смещениям
+    (sample_offsets), у сжатых в выборку берутся первые значения,
+    которые затем раскладываются вместе с остальными, поэтому каждый
+    исходный файл читается целиком ровно один раз.
+    Равные ключи всегда попадают в один диапазон, поэтому unique
+    и порядок равных значений работают так же, как без разбиения
+    :param input_files: исходные файлы (открытые на чтение)
+    :param output: выходной файл
+    :param stats: метрики, в которые добавляются фазы разбиения,
+    сортировки диапазонов и записи результата
+    :param partitions: кол-во диапазонов
+    :param executor: способ запуска сортировок диапазонов: "process" -
+    пул процессов, "subprocess" - отдельные процессы интерпретатора
+    :param type_data: тип считываемых данных
+    :param reverse: флаг сортировки по невозрастанию
+    :param key: ключ сортировки csv
+    :param header: заголовок csv
+    :param delimiter: разделитель между столбцами для csv
+    :param limit: кол-во первых значений, которые нужно записать
+    :param temp_dir: базовый каталог временных файлов
+    :param seed: зерно выборки ключей
+    :param params: остальные параметры my_sort для сортировки диапазонов,
+    params["workers"] - кол-во одновременно сортируемых диапазонов
+    (сами диапазоны сортируются одним процессом каждый)
+    """
+    if executor not in PARTITION_EXECUTORS:
+        raise ValueError(f"unknown partition executor: {executor}")
+    workers = params.pop("workers", 1)
+    sort_key = None if header is None else key
+    spill_dir = make_spill_dir(temp_dir)
+    try:
+        with stats.phase("sample") as item:
+            rnd = random.Random(seed)
+            sample_size = SAMPLE_PER_PARTITION * partitions
+            total = sum(file.size for file in input_files) or 1
+            sources, sample = [], []
+            for file in input_files:
+                share = max(sample_size * file.size // total, 1)
+                if split_codec(file.path)[1] is None:
+                    sample.extend(sample_offsets(file, share, rnd))
+                    sources.append(file)
+                else:
+                    prefix = file.read_buffer(share * PREFIX_SAMPLE_FACTOR)
+                    sample.extend(prefix)
+                    sources.append(chain(prefix, file))
+            keys = sample if sort_key is None else list(map(sort_key, sample))
+            splitters = choose_splitters(keys, partitions)
+            item.rows = len(sample)
+            item.estimated_comparisons = len(keys) * len(keys).bit_length()
+
+        ext = ".txt" if header is None else ".csv"
+        parts = [IO(f"part_{num}{ext}", "w", type_data, is_temp=True,
+                    header=header, delimiter=delimiter, temp_dir=spill_dir)
+                 for num in range(len(splitters) + 1)]
+        buffers = [[] for _ in parts]
+        counts = [0] * len(parts)
+        bsize = params.get("bsize", 1000)
+        with stats.phase("partition") as item:
+            for source in sources:
+                for value in source:
+                    num = bisect_right(
+                        splitters, value if sort_key is None
+                        else sort_key(value))
+                    buffers[num].append(value)
+                    if len(buffers[num]) >= bsize:
+                        parts[num].write_buffer(buffers[num])
+                        counts[num] += len(buffers[num])
+                        buffers[num] = []
+            for num, part in enumerate(parts):
+                part.write_buffer(buffers[num])
+                counts[num] += len(buffers[num])
+                part.change_mode("r")
+            item.add_input(input_files)
+            item.rows = sum(counts)
+            item.runs = sum(map(bool, counts))
+            item.bytes_written = sum(part.size for part in parts)
+            item.estimated_comparisons = \
+                item.rows * len(parts).bit_length()
+
+        params.update(type_data=type_data, reverse=reverse,
+                      key=None if sort_key is None else repr(sort_key),
+                      delimiter=delimiter, limit=limit, temp_dir=spill_dir,
+                      workers=1)
+        jobs = [(part.path, os.path.join(spill_dir, f"sorted_{num}{ext}"),
+                 params)
+                for num, part in enumerate(parts) if counts[num]]
+        if not jobs:
+            results = []
+        elif executor == "subprocess":
+            results = run_subprocess_jobs(jobs, spill_dir, workers)
+        else:
+            with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+                results = list(pool.map(sort_partition, *zip(*jobs)))
+        for (src, _, _), job_stats in zip(jobs, results):
+            for phase in job_stats.phases:
+                phase.file_num = os.path.splitext(os.path.basename(src))[0]
+            stats.add(job_stats)
+
+        sorted_parts = [IO(path, "r", type_data, delimiter=delimiter,
+                           key_val=key)
+                        for _, path, _ in jobs]
+        if reverse:
+            sorted_parts.reverse()
+        with stats.phase("concat") as item:
+            item.add_input(sorted_parts)
+            out = IO(output, "w", header=header, delimiter=delimiter)
+            out.write_run(islice(chain(*sorted_parts), limit))
+            out.file.close()
+            item.add_output([out])
+        for file in sorted_parts:
+            file.file.close()
+    finally:
+        remove_spill_dir(spill_dir, temp_dir == TEMP_DIR)
+
+
+def main(argv: Optional[list[str, ...]] = None) -> None:
+    """
+    Точка входа процесса, сортирующего один диапазон по заданию
+    из json файла, метрики сохраняются в файл, указанный в задании
+    :param argv: аргументы командной строки: путь к заданию
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    with open(argv[0], encoding="utf-8") as file:
+        job = json.load(file)
+    stats = sort_partition(job["src"], job["output"], job["params"])
+    with open(job["stats"], "wb") as file:
+        pickle.dump(stats, file)
+
+
+if __name__ == '__main__':
+    main()
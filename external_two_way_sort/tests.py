@@ -1,11 +1,24 @@
 """Тесты для модуля my_sort"""
 
+import bz2
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import gzip
+from itertools import islice
+import json
+import lzma
 import os
 import unittest
+from unittest import mock
 import shutil
 
-from external_sort import my_sort  # pylint: disable=E0401
+import benchmark  # pylint: disable=E0401
+import external_sort  # pylint: disable=E0401
+import generator  # pylint: disable=E0401
+from async_io import IOStats  # pylint: disable=E0401
+import internal_sort  # pylint: disable=E0401
+from internal_sort import merge_sort, numeric_sort  # pylint: disable=E0401
+from external_sort import my_sort, sort_iter  # pylint: disable=E0401
 
 TEST_NUMBER = [
     [],
@@ -184,6 +197,239 @@ class TestExternalSortOneFile(unittest.TestCase):
                         exit_lst.append(float(ptr.readline()))
                 self.assertEqual(exit_lst, sorted(data, reverse=True))
 
+    def test_sort_number_merge_order(self) -> None:
+        """Тест многопутевой сортировки числовых данных txt файла."""
+        for merge_order in (3, 4, 16):
+            for data in TEST_NUMBER:
+                with open(self.file_name, "w", encoding="utf-8") as ptr:
+                    for item in data:
+                        ptr.write(str(item) + "\n")
+                with self.subTest(merge_order=merge_order):
+                    my_sort(
+                        src=[self.file_name],
+                        output="",
+                        reverse=False,
+                        key="",
+                        type_data="i",
+                        bsize=2,
+                        merge_order=merge_order,
+                    )
+                    exit_lst = []
+                    with open(self.file_name, "r", encoding="utf-8") as ptr:
+                        for _ in range(len(data)):
+                            exit_lst.append(int(ptr.readline()))
+                    self.assertEqual(exit_lst, sorted(data))
+
+    def test_sort_number_replacement(self) -> None:
+        """Тест сортировки с формированием серий выбором с замещением."""
+        for reverse in (False, True):
+            for data in TEST_NUMBER:
+                with open(self.file_name, "w", encoding="utf-8") as ptr:
+                    for item in data:
+                        ptr.write(str(item) + "\n")
+                with self.subTest(reverse=reverse):
+                    my_sort(
+                        src=[self.file_name],
+                        output="",
+                        reverse=reverse,
+                        key="",
+                        type_data="i",
+                        bsize=2,
+                        split_mode="replacement",
+                    )
+                    exit_lst = []
+                    with open(self.file_name, "r", encoding="utf-8") as ptr:
+                        for _ in range(len(data)):
+                            exit_lst.append(int(ptr.readline()))
+                    self.assertEqual(exit_lst, sorted(data, reverse=reverse))
+
+    def test_sort_number_natural(self) -> None:
+        """Тест сортировки слиянием естественных серий."""
+        for data in TEST_NUMBER:
+            for arr in (data, sorted(data), sorted(data, reverse=True)):
+                with open(self.file_name, "w", encoding="utf-8") as ptr:
+                    for item in arr:
+                        ptr.write(str(item) + "\n")
+                with self.subTest():
+                    my_sort(src=[self.file_name], type_data="i", bsize=2,
+                            split_mode="natural")
+                    with open(self.file_name, "r", encoding="utf-8") as ptr:
+                        exit_lst = [int(line) for line in ptr]
+                    self.assertEqual(exit_lst, sorted(data))
+
+    def test_sort_number_limit(self) -> None:
+        """Тест отбора первых limit значений через кучу и внешнюю сортировку"""
+        for limit, split_mode in ((3, "block"), (3, "natural"),
+                                  (1, "replacement")):
+            for reverse in (False, True):
+                for data in TEST_NUMBER:
+                    with open(self.file_name, "w", encoding="utf-8") as ptr:
+                        for item in data:
+                            ptr.write(str(item) + "\n")
+                    with self.subTest(limit=limit, reverse=reverse):
+                        my_sort(src=[self.file_name], type_data="i",
+                                reverse=reverse, bsize=limit - 1 or 1,
+                                split_mode=split_mode, limit=limit)
+                        with open(self.file_name, "r",
+                                  encoding="utf-8") as ptr:
+                            exit_lst = [int(line) for line in ptr]
+                        self.assertEqual(
+                            exit_lst, sorted(data, reverse=reverse)[:limit])
+
+    def test_sort_number_unique(self) -> None:
+        """Тест сортировки с удалением дубликатов"""
+        for split_mode in ("block", "replacement", "natural"):
+            for data in TEST_NUMBER:
+                with open(self.file_name, "w", encoding="utf-8") as ptr:
+                    for item in data:
+                        ptr.write(str(item) + "\n")
+                with self.subTest(split_mode=split_mode):
+                    my_sort(src=[self.file_name], type_data="i", bsize=2,
+                            split_mode=split_mode, unique="first")
+                    with open(self.file_name, "r", encoding="utf-8") as ptr:
+                        exit_lst = [int(line) for line in ptr]
+                    self.assertEqual(exit_lst, sorted(set(data)))
+
+    def test_sort_number_compressed(self) -> None:
+        """Тест сортировки со сжатием временных лент"""
+        data = [i * 37 % 101 for i in range(300)]
+        with open(self.file_name, "w", encoding="utf-8") as ptr:
+            for item in data:
+                ptr.write(str(item) + "\n")
+        for spill_format in ("text", "binary"):
+            for io_queue_depth in (0, 2):
+                stats = IOStats()
+                with self.subTest(spill_format=spill_format,
+                                  io_queue_depth=io_queue_depth):
+                    my_sort(src=[self.file_name], type_data="i", bsize=20,
+                            reverse=True, spill_format=spill_format,
+                            io_queue_depth=io_queue_depth, io_stats=stats,
+                            compress_level=6)
+                    with open(self.file_name, "r", encoding="utf-8") as ptr:
+                        exit_lst = [int(line) for line in ptr]
+                    self.assertEqual(exit_lst, sorted(data, reverse=True))
+                    self.assertEqual([item.pass_num
+                                      for item in stats.spill_passes],
+                                     [0, 1, 2, 3, 4])
+                    for item in stats.spill_passes:
+                        self.assertGreater(item.ratio, 1)
+
+    def test_sort_compressed_txt_file(self) -> None:
+        """Тест сортировки сжатого txt файла на месте"""
+        file_name = "tests/test_sort_one_file.txt.gz"
+        for data in TEST_NUMBER:
+            with gzip.open(file_name, "wt", encoding="utf-8") as ptr:
+                for item in data:
+                    ptr.write(str(item) + "\n")
+            with self.subTest():
+                stats = my_sort(src=[file_name], type_data="i", bsize=2)
+                with gzip.open(file_name, "rt", encoding="utf-8") as ptr:
+                    exit_lst = [int(line) for line in ptr]
+                self.assertEqual(exit_lst, sorted(data))
+                for item in stats.phases:
+                    if item.phase == "copy_back":
+                        self.assertEqual(item.bytes_written,
+                                         os.path.getsize(file_name))
+
+    def test_sort_number_resume(self) -> None:
+        """Тест продолжения прерванной сортировки по манифесту"""
+        data = [i * 37 % 101 for i in range(40)]
+        with open(self.file_name, "w", encoding="utf-8") as ptr:
+            for item in data:
+                ptr.write(str(item) + "\n")
+        write_run = external_sort.IO.write_run
+        calls = []
+
+        def failing_write_run(tape, run):
+            calls.append(tape.filename)
+            if len(calls) == 33:
+                raise RuntimeError("crash")
+            write_run(tape, run)
+
+        with mock.patch.object(external_sort.IO, "write_run",
+                               failing_write_run):
+            with self.assertRaises(RuntimeError):
+                my_sort(src=[self.file_name], type_data="i", bsize=2,
+                        checkpoint=True)
+            spill_dir = os.path.join(
+                external_sort.TEMP_DIR, external_sort.checkpoint_dir_name(
+                    [self.file_name], None))
+            self.assertTrue(os.path.isfile(
+                external_sort.manifest_path(0, spill_dir)))
+            calls.clear()
+            my_sort(src=[self.file_name], type_data="i", bsize=2,
+                    resume=True)
+        self.assertEqual(len(calls), 5 + 3 + 2 + 1)
+        with open(self.file_name, "r", encoding="utf-8") as ptr:
+            exit_lst = [int(line) for line in ptr]
+        self.assertEqual(exit_lst, sorted(data))
+        self.assertFalse(os.path.exists(external_sort.TEMP_DIR))
+
+    def test_tape_bookkeeping(self) -> None:
+        """Тест учета кол-ва значений, серий и размера ленты"""
+        data = [i * 37 % 101 for i in range(50)]
+        result = external_sort.external_sort(data, "tape", type_data="i",
+                                             bsize=3)
+        self.assertEqual(result.records, len(data))
+        self.assertEqual(result.runs, [len(data)])
+        self.assertEqual(result.size, sum(len(f"{i}\n") for i in data))
+        self.assertFalse(result.is_empty())
+        self.assertEqual(list(result), sorted(data))
+
+    def test_sort_number_stats(self) -> None:
+        """Тест метрик сортировки по фазам"""
+        data = [i * 37 % 101 for i in range(20)]
+        with open(self.file_name, "w", encoding="utf-8") as ptr:
+            for item in data:
+                ptr.write(str(item) + "\n")
+        phases = []
+        stats = my_sort(src=[self.file_name], type_data="i", bsize=2,
+                        on_phase=phases.append)
+        self.assertEqual(phases, stats.phases)
+        self.assertEqual([item.phase for item in phases],
+                         ["split"] + ["merge"] * 4 + ["copy_back"])
+        self.assertEqual([item.runs for item in phases], [10, 5, 3, 2, 1, 1])
+        for item in phases:
+            self.assertEqual(item.rows, len(data))
+            self.assertEqual(item.bytes_written, os.path.getsize(
+                self.file_name))
+        self.assertGreater(phases[0].estimated_comparisons, 0)
+        self.assertEqual(stats.passes, 4)
+        json_name = "tests/stats.json"
+        stats.dump(json_name)
+        with open(json_name, "r", encoding="utf-8") as ptr:
+            dumped = json.load(ptr)
+        self.assertEqual(dumped["totals"]["initial_runs"], 10)
+        self.assertGreater(dumped["totals"]["wall_time"], 0)
+        self.assertIn("estimated_comparisons", dumped["phases"][0])
+        self.assertEqual(len(dumped["phases"]), 6)
+
+    def test_sort_big_numbers(self) -> None:
+        """Тест сортировки целых чисел, не помещающихся в 64 бита."""
+        data = [2 ** 70, -5, 2 ** 63, 0, -2 ** 64, 7, -2 ** 63, 2 ** 63 - 1]
+        for spill_format in ("text", "binary"):
+            with open(self.file_name, "w", encoding="utf-8") as ptr:
+                for item in data:
+                    ptr.write(str(item) + "\n")
+            with self.subTest(spill_format=spill_format):
+                my_sort(src=[self.file_name], type_data="i", bsize=3,
+                        reverse=True, spill_format=spill_format)
+                with open(self.file_name, "r", encoding="utf-8") as ptr:
+                    exit_lst = [int(line) for line in ptr]
+                self.assertEqual(exit_lst, sorted(data, reverse=True))
+
+    def test_sort_small_txt_blocks(self) -> None:
+        """Тест блочного чтения txt файла со строками на границах блоков."""
+        block_size = external_sort.TXT_BLOCK_SIZE
+        external_sort.TXT_BLOCK_SIZE = 3
+        try:
+            with open(self.file_name, "w", encoding="utf-8") as ptr:
+                ptr.write("5\n123456\n-2\n0\n7")
+            my_sort(src=[self.file_name], type_data="i", bsize=2)
+        finally:
+            external_sort.TXT_BLOCK_SIZE = block_size
+        with open(self.file_name, "r", encoding="utf-8") as ptr:
+            self.assertEqual(ptr.read(), "-2\n0\n5\n7\n123456\n")
 
     def tearDown(self) -> None:
         """Действия после окончания теста."""
@@ -231,6 +477,210 @@ class TestExternalSortCSVFile(unittest.TestCase):
                 ptr.close()
                 self.assertEqual(exit_file, sorted(data))
 
+    def test_sort_csv_file_binary_spill(self) -> None:
+        """Тест сортировки csv файла с бинарными временными лентами"""
+        key = "sort"
+        for data in TEST_NUMBER:
+            with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+                writer = csv.DictWriter(ptr, fieldnames=["name", key])
+                writer.writeheader()
+                for i in data:
+                    writer.writerow({"name": f"row {i}", key: i})
+            with self.subTest():
+                my_sort(
+                    src=[self.file_name],
+                    output="",
+                    reverse=False,
+                    key=key,
+                    type_data="i",
+                    bsize=2,
+                    spill_format="binary",
+                )
+                with open(self.file_name, "r", encoding="utf-8") as ptr:
+                    rows = list(csv.DictReader(ptr))
+                self.assertEqual([int(row[key]) for row in rows], sorted(data))
+                self.assertTrue(all(row["name"] == f"row {row[key]}"
+                                    for row in rows))
+
+    def test_sort_csv_file_workers(self) -> None:
+        """Тест сортировки csv файла с формированием серий в процессах"""
+        key = "sort"
+        data = [8, 0, 42, 3, 4, 8, 0, 45, 50, 9999, 7, -5, 0, 9, -999]
+        with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+            writer = csv.DictWriter(ptr, fieldnames=[key])
+            writer.writeheader()
+            for i in data:
+                writer.writerow({key: i})
+        my_sort(src=[self.file_name], reverse=True, key=key, type_data="i",
+                bsize=2, workers=2)
+        with open(self.file_name, "r", encoding="utf-8") as ptr:
+            exit_file = [int(row[key]) for row in csv.DictReader(ptr)]
+        self.assertEqual(exit_file, sorted(data, reverse=True))
+
+    def test_sort_csv_file_composite_key(self) -> None:
+        """Тест сортировки csv файла по составному ключу"""
+        data = [(i % 3, f"s{i % 4}", i * 0.5) for i in range(-7, 12)]
+        expected = sorted(sorted(data, key=lambda row: row[2]),
+                          key=lambda row: (-row[0], row[1]))
+        for spill_format in ("text", "binary"):
+            with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+                writer = csv.writer(ptr)
+                writer.writerow(["a", "b", "c"])
+                writer.writerows(data)
+            with self.subTest(spill_format=spill_format):
+                my_sort(src=[self.file_name], key="a:desc,b:s,c:f",
+                        type_data="i", bsize=4, spill_format=spill_format)
+                with open(self.file_name, "r", encoding="utf-8") as ptr:
+                    rows = [(int(a), b, float(c))
+                            for a, b, c in list(csv.reader(ptr))[1:]]
+                self.assertEqual(rows, expected)
+
+    def test_sort_csv_file_limit(self) -> None:
+        """Тест отбора первых limit строк csv файла по составному ключу"""
+        data = [(i % 3, f"s{i % 4}") for i in range(-7, 12)]
+        expected = sorted(data, key=lambda row: (-row[0], row[1]))[:5]
+        output = "tests/test_sort_csv_limit.csv"
+        for bsize in (2, 10):
+            with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+                writer = csv.writer(ptr)
+                writer.writerow(["a", "b"])
+                writer.writerows(data)
+            with self.subTest(bsize=bsize):
+                my_sort(src=[self.file_name], output=output, key="a:desc,b:s",
+                        type_data="i", bsize=bsize, limit=5)
+                with open(output, "r", encoding="utf-8") as ptr:
+                    rows = [(int(a), b) for a, b in list(csv.reader(ptr))[1:]]
+                self.assertEqual(rows, expected)
+
+    def test_sort_csv_file_limit_merge_output(self) -> None:
+        """Тест порядка равных ключей при отборе limit строк
+        со слиянием с выходным файлом: строки выходного файла первые"""
+        output = "tests/test_sort_csv_limit.csv"
+        for limit, bsize in ((1, 10), (1, 2), (3, 2), (3, 10)):
+            with open(output, "w", newline="", encoding="utf-8") as ptr:
+                csv.writer(ptr).writerows([["a", "b"], [1, "old"],
+                                           [2, "old"]])
+            with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+                csv.writer(ptr).writerows([["a", "b"], [2, "new"],
+                                           [1, "new"], [5, "new"]])
+            with self.subTest(limit=limit, bsize=bsize):
+                my_sort(src=[self.file_name], output=output, key="a",
+                        type_data="i", bsize=bsize, limit=limit,
+                        merge_output=True)
+                with open(output, "r", encoding="utf-8") as ptr:
+                    rows = [(int(a), b) for a, b in list(csv.reader(ptr))[1:]]
+                self.assertEqual(rows, [(1, "old"), (1, "new"),
+                                        (2, "old")][:limit])
+
+    def test_sort_csv_file_unique(self) -> None:
+        """Тест удаления строк csv с одинаковым ключом"""
+        data = [(i % 4, i) for i in range(15)]
+        output = "tests/test_sort_csv_unique.csv"
+        for keep in ("first", "last"):
+            for io_queue_depth in (0, 2):
+                with open(self.file_name, "w", newline="",
+                          encoding="utf-8") as ptr:
+                    writer = csv.writer(ptr)
+                    writer.writerow(["a", "b"])
+                    writer.writerows(data)
+                with self.subTest(keep=keep, io_queue_depth=io_queue_depth):
+                    my_sort(src=[self.file_name, self.file_name],
+                            output=output, key="a", type_data="i", bsize=3,
+                            unique=keep, io_queue_depth=io_queue_depth)
+                    with open(output, "r", encoding="utf-8") as ptr:
+                        rows = [(int(a), int(b))
+                                for a, b in list(csv.reader(ptr))[1:]]
+                    pick = min if keep == "first" else max
+                    self.assertEqual(
+                        rows, [(a, pick(b for x, b in data if x == a))
+                               for a in range(4)])
+
+    def test_sort_csv_file_partitions(self) -> None:
+        """Тест сортировки csv с разбиением на диапазоны и unique"""
+        data = [(i % 7, i) for i in range(40)]
+        output = "tests/test_sort_csv_partitions.csv"
+        with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+            writer = csv.writer(ptr)
+            writer.writerow(["a", "b"])
+            writer.writerows(data)
+        for keep in ("first", "last"):
+            with self.subTest(keep=keep):
+                my_sort(src=[self.file_name], output=output,
+                        key="a:i:desc,b:s", type_data="i", bsize=4,
+                        unique=keep, partitions=3)
+                with open(output, "r", encoding="utf-8") as ptr:
+                    rows = [(int(a), int(b))
+                            for a, b in list(csv.reader(ptr))[1:]]
+                self.assertEqual(rows, sorted(data,
+                                              key=lambda r: (-r[0], str(r[1]))))
+
+    def test_sort_csv_file_compressed(self) -> None:
+        """Тест сортировки csv файла со сжатием временных лент"""
+        data = [(i * 7 % 19, f"s{i}") for i in range(40)]
+        with open(self.file_name, "w", newline="", encoding="utf-8") as ptr:
+            writer = csv.writer(ptr)
+            writer.writerow(["a", "b"])
+            writer.writerows(data)
+        my_sort(src=[self.file_name], key="a", type_data="i", bsize=5,
+                file_workers=2, compress_level=1)
+        with open(self.file_name, "r", encoding="utf-8") as ptr:
+            rows = [(int(a), b) for a, b in list(csv.reader(ptr))[1:]]
+        self.assertEqual(rows, sorted(data, key=lambda row: row[0]))
+
+    def test_sort_compressed_csv_files(self) -> None:
+        """Тест сортировки сжатых csv файлов в сжатый выходной файл"""
+        first, second = "tests/first.csv.bz2", "tests/second.csv.gz"
+        output = "tests/output.csv.xz"
+        data = [[(i * 7 % 19, f"s{i}") for i in range(20)],
+                [(i * 5 % 11, f"t{i}") for i in range(15)]]
+        for name, codec, rows in zip((first, second), (bz2, gzip), data):
+            with codec.open(name, "wt", newline="", encoding="utf-8") as ptr:
+                writer = csv.writer(ptr)
+                writer.writerow(["a", "b"])
+                writer.writerows(rows)
+        stats = my_sort(src=[first, second], output=output, key="a",
+                        type_data="i", bsize=4)
+        with lzma.open(output, "rt", newline="", encoding="utf-8") as ptr:
+            rows = [(int(a), b) for a, b in list(csv.reader(ptr))[1:]]
+        self.assertEqual(rows, sorted(data[0] + data[1],
+                                      key=lambda row: row[0]))
+        self.assertEqual(stats.phases[-1].phase, "final_merge")
+        self.assertEqual(stats.phases[-1].bytes_written,
+                         os.path.getsize(output))
+        self.assertEqual(sorted(os.listdir(self.dir_name)),
+                         ["first.csv.bz2", "output.csv.xz", "second.csv.gz",
+                          "test_sort_csv.csv"])
+
+    def test_merge_more_csv_files_reverse(self) -> None:
+        """Тест слияния нескольких csv файлов в один по невозрастанию"""
+        key = "sort"
+        output = "tests/test_sort_csv_output.csv"
+        names = ["tests/test_sort_csv_1.csv", "tests/test_sort_csv_2.csv",
+                 "tests/test_sort_csv_3.csv"]
+        for data in TEST_MORE_TXT:
+            parts = [data[0], data[1], data[0] + data[1]]
+            for name, part in zip(names, parts):
+                with open(name, "w", newline="", encoding="utf-8") as ptr:
+                    writer = csv.DictWriter(ptr, fieldnames=[key, "other"])
+                    writer.writeheader()
+                    for i in part:
+                        writer.writerow({key: i, "other": -i})
+            with self.subTest():
+                my_sort(
+                    src=names,
+                    output=output,
+                    reverse=True,
+                    key=key,
+                    type_data="i",
+                    bsize=2,
+                )
+                with open(output, "r", encoding="utf-8") as ptr:
+                    rows = list(csv.DictReader(ptr))
+                self.assertEqual([int(row[key]) for row in rows],
+                                 sorted(sum(parts, []), reverse=True))
+                self.assertTrue(all(int(row[key]) == -int(row["other"])
+                                    for row in rows))
+
     def tearDown(self) -> None:
         """Действия после окончания теста."""
         shutil.rmtree(self.dir_name)
@@ -312,6 +762,396 @@ class TestExternalSortTwoFile(unittest.TestCase):
                         output_file.append(int(ptr.readline()))
                 self.assertEqual(output_file, data)
 
+    def test_sort_more_files_file_workers(self) -> None:
+        """Тест одновременной сортировки нескольких txt файлов в процессах"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        for data in TEST_MORE_TXT:
+            with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+                for item in data[0]:
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_second, "w", encoding="utf-8") as ptr:
+                for item in data[1]:
+                    ptr.write(str(item) + "\n")
+            with self.subTest():
+                my_sort(
+                    src=[self.file_name_first, self.file_name_second],
+                    output=output,
+                    type_data="i",
+                    bsize=2,
+                    file_workers=2,
+                )
+                with open(output, "r", encoding="utf-8") as ptr:
+                    output_file = [int(line) for line in ptr]
+                self.assertEqual(output_file, sorted(data[0] + data[1]))
+
+    def test_sort_more_files_partitions(self) -> None:
+        """Тест сортировки нескольких txt файлов с разбиением на диапазоны"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        for data in TEST_MORE_TXT:
+            with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+                for item in data[0]:
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_second, "w", encoding="utf-8") as ptr:
+                for item in data[1]:
+                    ptr.write(str(item) + "\n")
+            for executor in ("process", "subprocess"):
+                for reverse in (False, True):
+                    with self.subTest(executor=executor, reverse=reverse):
+                        stats = my_sort(
+                            src=[self.file_name_first, self.file_name_second],
+                            output=output, type_data="i", bsize=2,
+                            reverse=reverse, partitions=3, workers=2,
+                            partition_executor=executor)
+                        with open(output, "r", encoding="utf-8") as ptr:
+                            output_file = [int(line) for line in ptr]
+                        self.assertEqual(output_file,
+                                         sorted(data[0] + data[1],
+                                                reverse=reverse))
+                        self.assertEqual(stats.phases[-1].phase, "concat")
+                        self.assertTrue(all(
+                            item.file_num.startswith("part_")
+                            for item in stats.phases
+                            if item.phase == "final_merge"))
+
+    def test_partitions_single_read(self) -> None:
+        """Тест однократного чтения исходных файлов при разбиении"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        data = [i * 37 % 1001 for i in range(3000)]
+        gz_name = self.file_name_second + ".gz"
+        with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+            ptr.write("".join(f"{item}\n" for item in data))
+        with gzip.open(gz_name, "wt", encoding="utf-8") as ptr:
+            ptr.write("".join(f"{item}\n" for item in data))
+        read = external_sort.IO.read
+        for name in (self.file_name_first, gz_name):
+            reads = []
+
+            def counting_read(file):
+                if file.path == name:
+                    reads.append(1)
+                return read(file)
+
+            with self.subTest(name=name), \
+                    mock.patch.object(external_sort.IO, "read",
+                                      counting_read):
+                my_sort(src=name, output=output, type_data="i", bsize=200,
+                        partitions=4, workers=2)
+                with open(output, "r", encoding="utf-8") as ptr:
+                    self.assertEqual([int(line) for line in ptr],
+                                     sorted(data))
+                self.assertLessEqual(len(reads), len(data) + 1)
+        os.remove(gz_name)
+
+    def test_sort_more_files_natural(self) -> None:
+        """Тест слияния естественных серий нескольких txt файлов в процессах"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        for data in TEST_MORE_TXT:
+            with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+                for item in sorted(data[0]):
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_second, "w", encoding="utf-8") as ptr:
+                for item in data[1]:
+                    ptr.write(str(item) + "\n")
+            with self.subTest():
+                my_sort(
+                    src=[self.file_name_first, self.file_name_second],
+                    output=output,
+                    type_data="i",
+                    split_mode="natural",
+                    file_workers=2,
+                )
+                with open(output, "r", encoding="utf-8") as ptr:
+                    output_file = [int(line) for line in ptr]
+                self.assertEqual(output_file, sorted(data[0] + data[1]))
+
+    def test_sort_more_files_merge_output(self) -> None:
+        """Тест слияния новых файлов с уже отсортированным выходным файлом"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        history = [-7, 0, 3, 3, 100]
+        for data in TEST_MORE_TXT:
+            with open(output, "w", encoding="utf-8") as ptr:
+                for item in history:
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+                for item in data[0]:
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_second, "w", encoding="utf-8") as ptr:
+                for item in data[1]:
+                    ptr.write(str(item) + "\n")
+            with self.subTest():
+                my_sort(
+                    src=[self.file_name_first, self.file_name_second],
+                    output=output,
+                    type_data="i",
+                    bsize=2,
+                    merge_output=True,
+                )
+                with open(output, "r", encoding="utf-8") as ptr:
+                    output_file = [int(line) for line in ptr]
+                self.assertEqual(output_file,
+                                 sorted(history + data[0] + data[1]))
+        self.assertEqual(sorted(os.listdir(self.dir_name)),
+                         sorted(["test_sort_more_txt_files_1.txt",
+                                 "test_sort_more_txt_files_2.txt",
+                                 "test_sort_more_txt_files_output.txt"]))
+
+    def test_sort_more_files_io_queue(self) -> None:
+        """Тест сортировки нескольких txt файлов с фоновым вводом-выводом"""
+        output = "tests/test_sort_more_txt_files_output.txt"
+        for data in TEST_MORE_TXT:
+            with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+                for item in data[0]:
+                    ptr.write(str(item) + "\n")
+            with open(self.file_name_second, "w", encoding="utf-8") as ptr:
+                for item in data[1]:
+                    ptr.write(str(item) + "\n")
+            with self.subTest():
+                io_stats = IOStats()
+                my_sort(
+                    src=[self.file_name_first, self.file_name_second],
+                    output=output,
+                    type_data="i",
+                    bsize=2,
+                    io_queue_depth=2,
+                    io_stats=io_stats,
+                )
+                with open(output, "r", encoding="utf-8") as ptr:
+                    output_file = [int(line) for line in ptr]
+                self.assertEqual(output_file, sorted(data[0] + data[1]))
+                self.assertGreaterEqual(io_stats.read_wait, 0)
+                if output_file:
+                    self.assertGreater(io_stats.write_batches, 0)
+
+    def test_sort_files_concurrently(self) -> None:
+        """Тест одновременных сортировок с общим каталогом временных файлов"""
+        temp_dir = "tests/spill"
+        data = [[i * 37 % 101 for i in range(60)],
+                [i * 11 % 31 for i in range(45)]]
+        for name, values in zip((self.file_name_first, self.file_name_second),
+                                data):
+            with open(name, "w", encoding="utf-8") as ptr:
+                for item in values:
+                    ptr.write(str(item) + "\n")
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(lambda name: my_sort(src=name, type_data="i",
+                                               bsize=3, temp_dir=temp_dir),
+                          (self.file_name_first, self.file_name_second)))
+        for name, values in zip((self.file_name_first, self.file_name_second),
+                                data):
+            with open(name, "r", encoding="utf-8") as ptr:
+                self.assertEqual([int(line) for line in ptr], sorted(values))
+        self.assertEqual(os.listdir(temp_dir), [])
+
+    def test_spill_dir_cleanup_on_error(self) -> None:
+        """Тест удаления каталога лент после ошибки сортировки"""
+        temp_dir = "tests/spill_error"
+        os.makedirs(temp_dir, exist_ok=True)
+        with open(self.file_name_first, "w", encoding="utf-8") as ptr:
+            ptr.write("".join(f"{i * 7 % 13}\n" for i in range(20)))
+        with mock.patch.object(external_sort, "merge_to_one",
+                               side_effect=RuntimeError("merge failed")):
+            with self.assertRaises(RuntimeError):
+                external_sort.my_sort(
+                    src=self.file_name_first, output="tests/out_error.txt",
+                    type_data="i", bsize=3, temp_dir=temp_dir)
+        self.assertEqual(os.listdir(temp_dir), [])
+
     def tearDown(self) -> None:
         """Действия после окончания теста."""
-        shutil.rmtree(self.dir_name)
\ No newline at end of file
+        shutil.rmtree(self.dir_name)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Тест-кейс прогона замеров производительности."""
+
+    def test_run_benchmark(self) -> None:
+        """Тест прогона по сочетаниям параметров и поиска замедлений"""
+        workdir = "tests_bench"
+        results = benchmark.run_benchmark(
+            ["i", "csv"], [benchmark.parse_size("8KB")], [500], [2, 3], [2],
+            workdir=workdir, verify=True)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertTrue(result["sorted"])
+            self.assertGreater(result["passes"], 0)
+        self.assertFalse(os.path.exists(workdir))
+        slow = [dict(result, time=result["time"] * 2) for result in results]
+        self.assertEqual(len(benchmark.find_regressions(slow, results)), 4)
+        self.assertEqual(benchmark.find_regressions(results, slow), [])
+
+
+class TestGenerator(unittest.TestCase):
+    """Тест-кейс генератора входных файлов."""
+
+    def test_distributions(self) -> None:
+        """Тест распределений, воспроизводимости и сортировки результата"""
+        for distribution in generator.DISTRIBUTIONS:
+            for data_type, descr in (("i", int), ("f", float), ("s", str)):
+                with self.subTest(distribution=distribution,
+                                  data_type=data_type):
+                    lines = list(islice(generator.generate_lines(
+                        data_type, distribution, 500, str_len=5, seed=7),
+                        500))
+                    self.assertEqual(lines, list(islice(
+                        generator.generate_lines(data_type, distribution,
+                                                 500, str_len=5, seed=7),
+                        500)))
+                    values = [descr(line) for line in lines]
+                    if distribution == "sorted":
+                        self.assertEqual(values, sorted(values))
+                    elif distribution == "reversed":
+                        self.assertEqual(values, sorted(values, reverse=True))
+                    elif distribution in ("duplicates", "zipf"):
+                        self.assertLessEqual(len(set(values)), 16)
+                    if data_type == "s":
+                        self.assertEqual({len(line) for line in lines}, {5})
+        zipf = list(islice(generator.generate_lines(
+            "i", "zipf", cardinality=100, seed=1), 1000))
+        self.assertGreater(zipf.count(min(zipf, key=int)), 1000 // 10)
+
+    def test_write_workload(self) -> None:
+        """Тест записи txt, csv и сжатого файла по кол-ву строк и размеру"""
+        txt, csv_name, gz_name = "gen_test.txt", "gen_test.csv", "gen_test.csv.gz"
+        try:
+            self.assertEqual(generator.write_workload(
+                txt, rows=3000, distribution="nearly_sorted", seed=3), 3000)
+            with open(txt) as file:
+                self.assertEqual(len(file.readlines()), 3000)
+            generator.write_workload(csv_name, size=20000, columns=6,
+                                     distribution="zipf", seed=3)
+            self.assertGreaterEqual(os.path.getsize(csv_name), 20000)
+            with open(csv_name) as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(rows[0], list("abcdef"))
+            self.assertEqual({len(row) for row in rows[1:]}, {6})
+            generator.write_workload(gz_name, rows=100, seed=3)
+            with gzip.open(gz_name, "rt") as file:
+                self.assertEqual(len(file.readlines()), 101)
+            my_sort([txt], type_data="i", bsize=100)
+            with open(txt) as file:
+                values = [int(line) for line in file]
+            self.assertEqual(values, sorted(values))
+        finally:
+            for name in (txt, csv_name, gz_name):
+                if os.path.exists(name):
+                    os.remove(name)
+
+
+class TestSortIter(unittest.TestCase):
+    """Тест-кейс ленивой сортировки итерируемых объектов."""
+
+    def test_sort_iter_values(self) -> None:
+        """Тест сортировки значений со сбросом серий на диск и без него"""
+        for data in TEST_NUMBER + TEST_STR + TEST_FLOAT:
+            for reverse in (False, True):
+                with self.subTest(reverse=reverse):
+                    res = sort_iter(iter(data), reverse=reverse, bsize=3)
+                    self.assertEqual(list(res), sorted(data, reverse=reverse))
+
+    def test_sort_iter_numbers_inference(self) -> None:
+        """Тест определения типа по первому блоку при сбросе на диск"""
+        big = [2 ** 70, 1, 2 ** 65, 3, -2 ** 63, -2 ** 80, 0]
+        mixed = [1, 2.5, 0.5, 3, -7, 1.25]
+        for data in (big, mixed):
+            with self.subTest(data=data):
+                self.assertEqual(list(sort_iter(data, bsize=2)),
+                                 sorted(data))
+                self.assertEqual(list(sort_iter(data, bsize=100)),
+                                 sorted(data))
+
+    def test_sort_iter_text_spill(self) -> None:
+        """Тест отказа от текстовых лент, не сохраняющих значения"""
+        for data in (["a\nb", "None", "c"], [{"k": 1, "v": 2}]):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                list(sort_iter(data, bsize=2, spill_format="text"))
+        data = ["a\nb", "None", "c", "a"]
+        self.assertEqual(list(sort_iter(data, bsize=2)), sorted(data))
+
+    def test_sort_iter_type_change(self) -> None:
+        """Тест значения другого типа после первого блока"""
+        for data in ([3, 1, 2, 2.5, 0.5, 7], [3, 1, 2, "a", 5, 7],
+                     ["b", "a", "c", 1, "d", "e"]):
+            with self.subTest(data=data):
+                with self.assertRaisesRegex(ValueError, repr(data[3])):
+                    list(sort_iter(data, bsize=3))
+
+    def test_sort_iter_lazy_final_merge(self) -> None:
+        """Тест ленивого последнего слияния: серия со всеми значениями
+        не записывается на ленту"""
+        data = [(i * 7919) % 1000 for i in range(1000)]
+        add_run = external_sort.IO.add_run
+        for bsize, merge_order in ((100, 16), (10, 3)):
+            for reverse in (False, True):
+                lengths = []
+
+                def record(tape, length):
+                    lengths.append(length)
+                    add_run(tape, length)
+
+                with self.subTest(bsize=bsize, merge_order=merge_order,
+                                  reverse=reverse), \
+                        mock.patch.object(external_sort.IO, "add_run",
+                                          record):
+                    res = list(sort_iter(data, reverse=reverse, bsize=bsize,
+                                         merge_order=merge_order))
+                    self.assertEqual(res, sorted(data, reverse=reverse))
+                    self.assertTrue(lengths)
+                    self.assertLess(max(lengths), len(data))
+
+    def test_sort_iter_rows(self) -> None:
+        """Тест сортировки словарей по ключу"""
+        for data in TEST_NUMBER:
+            rows = [{"name": str(i), "sort": i} for i in data]
+            with self.subTest():
+                res = list(sort_iter(rows, key="sort", bsize=2))
+                self.assertEqual([row["sort"] for row in res], sorted(data))
+                self.assertTrue(all(row["name"] == str(row["sort"])
+                                    for row in res))
+
+
+class TestMergeSort(unittest.TestCase):
+    """Тест-кейс внутренней сортировки слиянием."""
+
+    def test_merge_sort(self) -> None:
+        """Тест сортировки значений, в том числе уже упорядоченных"""
+        for data in TEST_NUMBER + TEST_STR + TEST_FLOAT:
+            for reverse in (False, True):
+                for arr in (data, sorted(data), sorted(data, reverse=True)):
+                    with self.subTest(reverse=reverse):
+                        self.assertEqual(merge_sort(list(arr), reverse),
+                                         sorted(arr, reverse=reverse))
+
+    def test_merge_sort_key_stable(self) -> None:
+        """Тест устойчивости сортировки по ключу"""
+        for data in TEST_NUMBER:
+            pairs = [(item % 3, num) for num, item in enumerate(data)]
+            for reverse in (False, True):
+                with self.subTest(reverse=reverse):
+                    res = merge_sort(list(pairs), reverse,
+                                     key=lambda pair: pair[0])
+                    self.assertEqual(res, sorted(pairs, reverse=reverse,
+                                                 key=lambda pair: pair[0]))
+
+
+@unittest.skipUnless(internal_sort.numpy is not None, "numpy is not installed")
+class TestNumericSortNumpy(unittest.TestCase):
+    """Тест-кейс сортировки чисел через numpy."""
+
+    def test_numeric_sort(self) -> None:
+        """Тест сортировки целых и дробных чисел в обе стороны"""
+        for data_type, data in [("i", item) for item in TEST_NUMBER] \
+                + [("f", item) for item in TEST_FLOAT]:
+            for reverse in (False, True):
+                with self.subTest(data=data, reverse=reverse):
+                    res = numeric_sort(list(data), data_type, reverse)
+                    self.assertEqual(res.typecode,
+                                     internal_sort.NUMERIC_TYPES[data_type][0])
+                    self.assertEqual(list(res), sorted(data, reverse=reverse))
+
+    def test_numeric_sort_big_ints(self) -> None:
+        """Тест целых чисел вне int64: сортировка обычного списка"""
+        data = [2 ** 70, 1, -2 ** 63, 2 ** 63, -2 ** 80, 0]
+        for reverse in (False, True):
+            with self.subTest(reverse=reverse):
+                self.assertEqual(numeric_sort(list(data), "i", reverse),
+                                 sorted(data, reverse=reverse))
@@ -10,27 +10,119 @@ def main():
     parser = argparse.ArgumentParser(description="Внешняя сортировка "
                                                  "методом двухпутевого сбалансированного слияния")
     parser.add_argument("-src", dest="src", type=str, nargs="+",
-                        help="Список исходных файлов")
+                        help="Список исходных файлов, в том числе сжатых "
+                             "(.gz, .bz2, .xz)")
     parser.add_argument("--output", "-out", dest="output", type=str, default=None,
-                        help="Выходной файл")
+                        help="Выходной файл, при расширении .gz, .bz2 "
+                             "или .xz записывается сжатым")
     parser.add_argument("--type_data", "-td", dest="type_data", type=str, default="i",
                         help="Тип данных считываемых из файла")
     parser.add_argument("--reverse", "-r", dest="reverse", default=False,
                         action=argparse.BooleanOptionalAction,
                         help="Если указано - сортирует по невозрастанию")
     parser.add_argument("-key", dest="key", default=None, type=str,
-                        help="Ключ столбца для csv файла")
+                        help="Ключ сортировки csv файла: столбцы через "
+                             "запятую, у каждого можно указать тип и порядок, "
+                             "например b:i:desc,a:s")
     parser.add_argument("--delimiter", "-d", dest="delimiter", default=",",
                         help="Разделитель для csv файла")
+    parser.add_argument("--merge_order", "-k", dest="merge_order", type=int,
+                        default=2,
+                        help="Кол-во серий, сливаемых за один проход")
+    parser.add_argument("--split_mode", "-sm", dest="split_mode", type=str,
+                        default="block",
+                        choices=["block", "replacement", "natural"],
+                        help="Способ формирования начальных серий")
+    parser.add_argument("--spill_format", "-sf", dest="spill_format",
+                        type=str, default="text", choices=["text", "binary"],
+                        help="Формат временных лент")
+    parser.add_argument("--bsize", "-b", dest="bsize", type=int, default=1000,
+                        help="Размер серии, сортируемой в памяти "
+                             "одним процессом")
+    parser.add_argument("--workers", "-w", dest="workers", type=int,
+                        default=1,
+                        help="Кол-во процессов, сортирующих начальные серии "
+                             "(при --partitions - одновременно сортируемых "
+                             "диапазонов)")
+    parser.add_argument("--file_workers", "-fw", dest="file_workers",
+                        type=int, default=1,
+                        help="Кол-во одновременно сортируемых исходных файлов")
+    parser.add_argument("--io_queue_depth", "-q", dest="io_queue_depth",
+                        type=int, default=0,
+                        help="Глубина очередей фонового чтения и записи "
+                             "лент, 0 - синхронный ввод-вывод")
+    parser.add_argument("--merge_output", "-mo", dest="merge_output",
+                        default=False, action=argparse.BooleanOptionalAction,
+                        help="Если указано - выходной файл уже отсортирован "
+                             "и новые данные сливаются с ним")
+    parser.add_argument("--limit", "-l", dest="limit", type=int,
+                        default=None,
+                        help="Кол-во первых в порядке сортировки значений, "
+                             "которые нужно записать")
+    parser.add_argument("--unique", "-u", dest="unique", type=str,
+                        default=None, choices=["first", "last"],
+                        help="Удаление дубликатов: оставлять первое или "
+                             "последнее из равных значений")
+    parser.add_argument("--compress_level", "-z", dest="compress_level",
+                        type=int, default=0,
+                        help="Уровень сжатия zlib временных лент (1-9), "
+                             "0 - без сжатия")
+    parser.add_argument("--checkpoint", "-cp", dest="checkpoint",
+                        default=False, action=argparse.BooleanOptionalAction,
+                        help="Если указано - после каждого прохода "
+                             "сохраняется манифест для продолжения сортировки")
+    parser.add_argument("--resume", dest="resume", default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="Если указано - прерванная сортировка "
+                             "продолжается с последнего завершенного прохода")
+    parser.add_argument("--temp_dir", "-t", dest="temp_dir", type=str,
+                        default=None,
+                        help="Каталог временных файлов, в нем каждая "
+                             "сортировка создает свой каталог лент")
+    parser.add_argument("--stats_json", "-sj", dest="stats_json", type=str,
+                        default=None,
+                        help="Файл, в который записываются метрики "
+                             "сортировки по фазам в формате json")
+    parser.add_argument("--partitions", "-p", dest="partitions", type=int,
+                        default=1,
+                        help="Кол-во диапазонов ключей, сортируемых "
+                             "параллельно без итогового слияния")
+    parser.add_argument("--partition_executor", "-pe",
+                        dest="partition_executor", type=str,
+                        default="process",
+                        choices=ext.external_sort.PARTITION_EXECUTORS,
+                        help="Способ запуска сортировок диапазонов: пул "
+                             "процессов или отдельные процессы интерпретатора")
     args = parser.parse_args()
     res = {"src": args.src,
            "output": args.output,
            "type_data": args.type_data,
            "reverse": args.reverse,
            "key": args.key,
-           "delimiter": args.delimiter
+           "delimiter": args.delimiter,
+           "merge_order": args.merge_order,
+           "split_mode": args.split_mode,
+           "spill_format": args.spill_format,
+           "bsize": args.bsize,
+           "workers": args.workers,
+           "file_workers": args.file_workers,
+           "io_queue_depth": args.io_queue_depth,
+           "io_stats": ext.IOStats(),
+           "merge_output": args.merge_output,
+           "limit": args.limit,
+           "unique": args.unique,
+           "compress_level": args.compress_level,
+           "checkpoint": args.checkpoint,
+           "resume": args.resume,
+           "temp_dir": args.temp_dir,
+           "partitions": args.partitions,
+           "partition_executor": args.partition_executor
            }
-    ext.sort(**res)
+    stats = ext.sort(**res)
+    if args.stats_json:
+        stats.dump(args.stats_json)
+    if args.io_queue_depth or args.compress_level:
+        print(res["io_stats"])
 
 def for_tests():
     filenames_txt = []